@@ -120,6 +120,10 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres-password'),
         'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
         'PORT': os.getenv('POSTGRES_PORT', 5432),
+        # long-lived Celery and uWSGI processes keep their connection between tasks and requests
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 10 * 60)),
+        # real columns come back with every significant digit instead of rounded to 6
+        'OPTIONS': {'options': '-c extra_float_digits=3'},
     }
 }
 
@@ -154,16 +158,18 @@ CELERY_RESULT_BACKEND = 'redis://{redis_host}:{redis_port}/{redis_namespace}'.fo
     redis_namespace=0
 )
 
-CELERY_ALWAYS_EAGER = False
-CELERYD_PREFETCH_MULTIPLIER = 1
-CELERY_ACKS_LATE = True
-CELERYD_MAX_TASKS_PER_CHILD = 1
+# with namespace='CELERY' (stockpicker/celery.py) settings use the CELERY_-prefixed lowercase names
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# worker children are reused between tasks, keeping their imports, database connection and
+# provider session, and are only replaced once their resident memory passes this many KiB
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = int(os.getenv('CELERY_WORKER_MAX_MEMORY_PER_CHILD', 400 * 1024))
 
 CELERY_TIMEZONE = 'America/Chicago'
 
 CELERY_BEAT_SCHEDULE = {
     'quotes-hourly-update': {
-        'task': 'tickers.tasks.chained_ticker_updates',
+        'task': 'tickers.tasks.sweep_tickers',
         'schedule': crontab(hour="*/3", minute=0, day_of_week='mon,tue,wed,thu,fri'),
         # for local development testing:
         # 'schedule': crontab(hour="*", minute="*", day_of_week='*'),
@@ -185,10 +191,41 @@ ALLOWED_HOSTS = ['*']
 # custom app settings
 DECIMAL_DIGITS = 4
 MOVING_AVERAGE_WEEKS = 86
+# every moving-average window the API can serve; MOVING_AVERAGE_WEEKS is stored on Quote, the others in WindowSignal
+SIGNAL_WINDOWS_WEEKS = [20, 50, 86, 200]
 WEEKS_TO_DOWNLOAD = 260
+# only download and recompute quotes since the latest stored date, when the history allows it
+INCREMENTAL_UPDATES = True
+QUOTE_WRITE_BATCH_SIZE = 500
 
 INDEX_TICKER = 'SPY'
 
+# The derived signal columns of Quote and WindowSignal are stored as 4-byte reals (migration 0009),
+# whichever mode is set. 'packed' additionally keeps a copy of each ticker's served series in one
+# QuoteSeries row (about 36 bytes per quote on top of the Quote rows), which the ticker data endpoint
+# decodes in place instead of reading the rows: faster reads for more storage, so it is off by default.
+# pack_quote_series builds the rows for tickers updated before it was turned on.
+QUOTE_SERIES_STORAGE = os.getenv('QUOTE_SERIES_STORAGE', 'rows')
+
+# where quotes are downloaded from; LocalFileQuoteProvider reads QUOTE_FILES_PATH instead of the network
+QUOTE_PROVIDER = os.getenv('QUOTE_PROVIDER', 'tickers.utility.YahooQuoteProvider')
+QUOTE_FILES_PATH = os.getenv('QUOTE_FILES_PATH', os.path.join(BASE_DIR, 'quote_files'))
+
+# scheduled sweeps update tickers in batches; SWEEP_CONCURRENCY caps the batches in flight
+SWEEP_BATCH_SIZE = 20
+SWEEP_CONCURRENCY = 4
+
+# per-ticker update locks live in the cache under a lease that is renewed while the update runs,
+# so a crashed worker releases its tickers within LOCK_LEASE_SECONDS
+LOCK_LEASE_SECONDS = 60
+LOCK_POLL_SECONDS = 0.5
+# how long a job waits for a lock it cannot do without (the index, or a ticker being added)
+LOCK_WAIT_SECONDS = 5 * 60
+
+# share the index series between worker processes through the cache, not only within one process
+INDEX_SERIES_SHARED_CACHE = True
+INDEX_SERIES_CACHE_SECONDS = 24 * 60 * 60
+
 DEFAULT_TICKERS = [
     'AMZN',
     'GOOG',
@@ -199,6 +236,17 @@ DEFAULT_TICKERS = [
     'TSLA',
 ]
 
+# API responses are cached until the update pipeline changes their data; this only bounds stale keys
+RESPONSE_CACHE_SECONDS = 24 * 60 * 60
+
+# history held in the (dates x tickers) ratio matrix behind the cross-section endpoint,
+# rebuilt whenever any ticker's quotes change
+CROSS_SECTION_WEEKS = 104
+CROSS_SECTION_CACHE_SECONDS = 60 * 60
+
+# rows fetched per round trip from the server-side cursor of quote exports
+EXPORT_CHUNK_SIZE = 2000
+
 # Debug setting
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('APP_DEBUG', False)
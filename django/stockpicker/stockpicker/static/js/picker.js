@@ -14,7 +14,7 @@
 
     dataLength: 0,
 
-    searchResults: [],
+    searchColumns: {},
 
     chartPlotObjList: [],
 
@@ -93,10 +93,10 @@
 
           var date = new Date(pos.x);
 
-          var i = self.searchResults.length - 1;
-          while (i > 0 && self.searchResults[i].date > date) i--;
+          var i = self.dataLength - 1;
+          while (i > 0 && self.searchColumns.date[i] > date) i--;
 
-          self.updateChartStats(self.searchResults[i]);
+          self.updateChartStats(self.pointAt(i));
         }
       });
 
@@ -125,21 +125,13 @@
     },
 
     executeTickerDataRequest: function(ticker, index) {
+      // a GET, so the browser can revalidate with the response ETag
       return $.ajax({
         url : "/tickers/tickerdata/",
-        type: 'POST',
-        contentType:"application/json",
+        type: 'GET',
         dataType : "json",
-        data: JSON.stringify({
-          "es_request": {
-            "from": 0,
-            "size": 1000,
-            "query": { "match_all" : {} },
-            "sort": [ { "date": { "order": "asc" } } ]
-          },
-          "ticker": ticker,
-          "index": index
-        })
+        // the chart cannot draw more than a couple of points per pixel
+        data: { "ticker": ticker, "layout": "columns", "points": Math.max(500, 2 * $(".chart").width()) }
       });
     },
 
@@ -162,6 +154,24 @@
       });
 
       deferredRequest.done(function(json) {
+        self.waitForAddTickerJob(ticker, json.job_id);
+      });
+    },
+
+    // the ticker is added by a background job; poll its status until it finishes
+    waitForAddTickerJob: function(ticker, jobId) {
+      var self = this;
+
+      var deferredRequest = $.getJSON("/tickers/jobs/" + jobId + "/");
+
+      deferredRequest.done(function(json) {
+        if (!json.ready) {
+          if (json.stage) {
+            $("#success_message").html("Adding '" + ticker + "' (" + json.stage + "), please wait...");
+          }
+          setTimeout(function() { self.waitForAddTickerJob(ticker, jobId); }, 1000);
+          return;
+        }
         self.requestInProgress = false;
         if (json.success){
           $("#error_message").html("");
@@ -175,10 +185,23 @@
         else {
           $("#success_message").html("");
           $("#success_message").hide();
-          $("#error_message").html(json.msg);
+          $("#error_message").html(json.error);
           $("#error_message").show();
         }
       });
+
+      // the job expired or was never issued, so it will never finish
+      deferredRequest.fail(function(xhr) {
+        if (xhr.status !== 404) {
+          setTimeout(function() { self.waitForAddTickerJob(ticker, jobId); }, 1000);
+          return;
+        }
+        self.requestInProgress = false;
+        $("#success_message").html("");
+        $("#success_message").hide();
+        $("#error_message").html(xhr.responseJSON ? xhr.responseJSON.error : "Adding '" + ticker + "' failed");
+        $("#error_message").show();
+      });
     },
 
     formatRecommendation: function(obj) {
@@ -298,27 +321,33 @@
 
       deferredRequest.done(function(json) {
 
-        self.dataLength = json.results.length;
+        // parallel arrays: { date: [...], ac: [...], iac: [...], ... }
+        var columns = json.results;
+
+        self.dataLength = columns.date.length;
+
+        for (var i = 0; i < self.dataLength; i++) {
+          columns.date[i] = Date.parse(columns.date[i]);
+        }
 
-        self.searchResults = json.results;
+        self.searchColumns = columns;
 
-        self.dataSeriesDict = { date: [], zeros: [] };
-        for (var prop in json.results[0]) {
-          if (prop) {
+        self.dataSeriesDict = { zeros: [] };
+        for (var prop in columns) {
+          if (prop != "date") {
             self.dataSeriesDict[prop] = [];
           }
         }
 
-        $.each(json.results, function(idx, point) {
-          //console.log(point);
-          point.date = Date.parse(point.date);
-          self.dataSeriesDict.zeros.push([ point.date, 0 ]);
-          for (var prop in point) {
-            if (prop) {
-              self.dataSeriesDict[prop].push([ point.date, point[prop] ]);
+        for (var i = 0; i < self.dataLength; i++) {
+          var date = columns.date[i];
+          self.dataSeriesDict.zeros.push([ date, 0 ]);
+          for (var prop in columns) {
+            if (prop != "date") {
+              self.dataSeriesDict[prop].push([ date, columns[prop][i] ]);
             }
           }
-        });
+        }
 
         // plot adjusted close prices for ticker and index
         self.chartDataList = [
@@ -342,7 +371,7 @@
       self.chartPlotObjList = [];
       for (var i = 0; i < self.chartDataList.length; i++){
         var series = self.chartDataList[i];
-        if (self.chartDataList[i][0].data === undefined) {
+        if (self.dataLength == 0) {
             $("#chart"+(i+1)).html('<h3>No Data Found for ' + self.currentTicker + '</h3>');
         } else {
             self.chartPlotObjList.push($.plot($("#chart"+(i+1)), series, chartOptions));   
@@ -350,11 +379,21 @@
       }
 
       if (self.dataLength > 0) {
-          var point = self.searchResults[self.searchResults.length-1];
+          var point = self.pointAt(self.dataLength - 1);
           self.updateChartStats(point); 
       }
     },
 
+    pointAt: function(i) {
+      var self = this;
+
+      var point = {};
+      for (var prop in self.searchColumns) {
+        point[prop] = self.searchColumns[prop][i];
+      }
+      return point;
+    },
+
     updateChartStats: function(point) {
       var self = this;
 
@@ -6,7 +6,12 @@ from django.conf import settings
 from tickers.views import (TickersLoadedView,
                            SearchTickerDataView,
                            GetRecommendationsView,
-                           AddTickerView)
+                           AddTickerView,
+                           JobStatusView,
+                           ResponseCacheStatsView,
+                           MetricsView,
+                           QuoteExportView,
+                           CrossSectionView)
 
 from stockpicker.views import (PickerPageView,
                                AppHealthCheckView,
@@ -28,6 +33,16 @@ urlpatterns = [
 
     path('tickers/addticker/', AddTickerView.as_view(), name='add_ticker'),
 
+    path('tickers/jobs/<str:job_id>/', JobStatusView.as_view(), name='job_status'),
+
+    path('tickers/cachestats/', ResponseCacheStatsView.as_view(), name='response_cache_stats'),
+
+    path('tickers/export/', QuoteExportView.as_view(), name='export_quotes'),
+
+    path('tickers/crosssection/', CrossSectionView.as_view(), name='cross_section'),
+
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+
     path('health/app/', AppHealthCheckView.as_view()),
     path('health/celery/', CeleryHealthCheckView.as_view()),
     path('health/database/', DatabaseHealthCheckView.as_view()),
@@ -100,8 +100,12 @@ class QuotesUpdatedHealthCheckView(APIView):
     def get(self, request, *args, **kwargs):
         try:
             # make sure all the quotes have been updated
-            for ticker in [settings.INDEX_TICKER] + [t for t in settings.DEFAULT_TICKERS]:
-                assert Ticker.objects.get(symbol=ticker).latest_quote_date() is not None
+            symbols = [settings.INDEX_TICKER] + [t for t in settings.DEFAULT_TICKERS]
+            latest = dict(Ticker.objects.with_latest_quote_date().filter(symbol__in=symbols)
+                          .values_list('symbol', 'latest_quote'))
+            if len(latest) < len(set(symbols)):
+                raise Ticker.DoesNotExist
+            assert None not in latest.values()
             return Response({'status': 'healthy',
                              'quote_count': Quote.objects.all().count()})
         except AssertionError:
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from tickers.models import Ticker, Quote
+from tickers.models import Ticker, Quote, LatestSignal
 
 
 class TickerAdmin(admin.ModelAdmin):
@@ -50,5 +50,23 @@ class QuoteAdmin(admin.ModelAdmin):
     list_filter = ('ticker__symbol', 'date')
 
 
+class LatestSignalAdmin(admin.ModelAdmin):
+
+    model = LatestSignal
+
+    list_display = [
+        'ticker',
+        'date',
+        'adj_close',
+        'scaled_adj_close',
+        'sac_moving_average',
+        'sac_to_sacma_ratio',
+    ]
+
+    ordering = ('-date', 'ticker__symbol')
+    list_filter = ('date',)
+
+
 admin.site.register(Ticker, TickerAdmin)
 admin.site.register(Quote, QuoteAdmin)
+admin.site.register(LatestSignal, LatestSignalAdmin)
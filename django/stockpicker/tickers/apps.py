@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class TickersConfig(AppConfig):
     name = 'tickers'
+
+    def ready(self):
+        # connect signal receivers
+        from tickers import receivers  # noqa: F401
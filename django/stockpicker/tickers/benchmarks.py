@@ -0,0 +1,306 @@
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, close_old_connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases, setup_test_environment, \
+    teardown_test_environment
+from django.urls import reverse
+from django.utils.timezone import datetime
+
+from tickers.models import Ticker, Quote
+from tickers.trading_days import trading_days, latest_trading_day
+from tickers.utility import QuoteProvider, update_ticker_data, BASE_QUOTE_FIELDS
+
+# every synthetic series starts here, so overlapping downloads always agree
+SYNTHETIC_HISTORY_START = datetime(1990, 1, 2).date()
+
+# the benchmarks must not touch the shared cache of a running deployment
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'stockpicker-benchmarks'}}
+
+
+def synthetic_symbols(count):
+    return ['SYN{0:04d}'.format(number) for number in range(count)]
+
+
+class SyntheticQuoteProvider(QuoteProvider):
+
+    # deterministic random-walk prices for any symbol, without a network
+    def __init__(self):
+        self.frames = {}
+
+    def frame(self, symbol):
+        frame = self.frames.get(symbol)
+        if frame is None:
+            dates = trading_days().between(SYNTHETIC_HISTORY_START, datetime.today().date())
+            random = np.random.RandomState(zlib.crc32(symbol.encode('utf-8')))
+            adj_close = 50 * np.exp(np.cumsum(random.normal(0.0002, 0.015, len(dates))))
+            frame = pd.DataFrame({column: adj_close for column in BASE_QUOTE_FIELDS.values()},
+                                 index=pd.DatetimeIndex(dates, name='Date'))
+            frame['Volume'] = random.randint(100000, 10000000, len(dates)).astype(np.float64)
+            frame = self.frames[symbol] = frame
+        return frame
+
+    def fetch(self, symbols, start, end):
+        return {symbol: self.frame(symbol).loc[start:end] for symbol in symbols}
+
+
+@contextmanager
+def isolated_database(keepdb=False):
+    # a throwaway test database, so benchmarks never write to the configured one
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def timing_stats(seconds):
+    # the same statistics pytest-benchmark reports
+    seconds = np.asarray(seconds)
+    return {
+        'rounds': len(seconds),
+        'min': float(seconds.min()),
+        'max': float(seconds.max()),
+        'mean': float(seconds.mean()),
+        'median': float(np.median(seconds)),
+        'p95': float(np.percentile(seconds, 95)),
+        'ops': float(1 / seconds.mean()),
+    }
+
+
+def measure(func, rounds, setup=None):
+    seconds = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - started)
+    return timing_stats(seconds)
+
+
+def benchmark_pipeline(tickers, years):
+    symbols = synthetic_symbols(tickers)
+    with override_settings(QUOTE_PROVIDER='tickers.benchmarks.SyntheticQuoteProvider',
+                           WEEKS_TO_DOWNLOAD=52 * years):
+        started = time.perf_counter()
+        update_ticker_data(settings.INDEX_TICKER)
+        index_seconds = time.perf_counter() - started
+
+        seconds = []
+        rows_written = 0
+        for symbol in symbols:
+            timings = update_ticker_data(symbol, update_index=False)
+            seconds.append(timings.total_seconds)
+            rows_written += timings.counts['rows_written']
+
+        # nothing to download or write the second time
+        incremental = measure(lambda: [update_ticker_data(symbol, update_index=False) for symbol in symbols], 1)
+
+    return symbols, {
+        'index_seconds': index_seconds,
+        'ticker_seconds': timing_stats(seconds),
+        'tickers_per_second': len(symbols) / sum(seconds),
+        'rows_per_second': rows_written / sum(seconds),
+        'rows_written': rows_written,
+        'up_to_date_sweep_seconds': incremental['min'],
+    }
+
+
+def endpoint_requests(symbol):
+    # name -> (url, query parameters)
+    data_url = reverse('search_ticker_data')
+    return {
+        'tickerdata rows': (data_url, {'ticker': symbol}),
+        'tickerdata columns': (data_url, {'ticker': symbol, 'layout': 'columns'}),
+        'tickerdata packed': (data_url, {'ticker': symbol, 'layout': 'packed'}),
+        'tickerdata 500 points': (data_url, {'ticker': symbol, 'layout': 'columns', 'points': 500}),
+        'recommendations': (reverse('get_recommendations'), {}),
+        'cross section': (reverse('cross_section'), {'history': 1}),
+        'tickerlist': (reverse('tickers_loaded'), {}),
+    }
+
+
+def benchmark_endpoints(symbol, rounds):
+    client = Client()
+    results = {}
+    for name, (url, params) in endpoint_requests(symbol).items():
+
+        def request():
+            response = client.get(url, params)
+            assert response.status_code == 200, (name, response.status_code)
+
+        # cold: built from the database; warm: served by the response cache
+        results[name] = {'cold': measure(request, rounds, setup=cache.clear),
+                         'warm': measure(request, rounds)}
+    return results
+
+
+def run_suite(sizes, rounds=5):
+    # sizes: (tickers, years) pairs; expects an isolated database
+    report = {
+        'generated': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'database': connection.vendor,
+        },
+        'sizes': [],
+    }
+    for tickers, years in sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+
+        symbols, pipeline = benchmark_pipeline(tickers, years)
+        report['sizes'].append({
+            'tickers': tickers,
+            'years': years,
+            'quotes': Quote.objects.count(),
+            'pipeline': pipeline,
+            'endpoints': benchmark_endpoints(symbols[len(symbols) // 2], rounds),
+        })
+    return report
+
+
+def worker_task(symbol):
+    # what a Celery worker does around each task: the task, then Django's fixup drops
+    # the connection only if it is broken or older than CONN_MAX_AGE
+    started = time.perf_counter()
+    update_ticker_data(symbol, update_index=False)
+    close_old_connections()
+    return time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def remove_latest_quotes(symbols):
+    # every ticker is then one trading day behind, as before a scheduled sweep
+    Quote.objects.filter(ticker__symbol__in=symbols, date__gte=latest_trading_day(datetime.today().date())).delete()
+    Ticker.objects.filter(symbol__in=symbols).update(cached_latest_quote_date=None)
+
+
+def benchmark_worker_mode(symbols, max_tasks_per_child, conn_max_age):
+    # one incremental update per symbol through a single worker process that is replaced
+    # after max_tasks_per_child tasks (None: never), like Celery's prefork pool
+    remove_latest_quotes(symbols)
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    # the children open their own connections, with the CONN_MAX_AGE above
+    connections.close_all()
+    pool = multiprocessing.get_context('fork').Pool(1, maxtasksperchild=max_tasks_per_child)
+    started = time.perf_counter()
+    try:
+        results = pool.map(worker_task, symbols, chunksize=1)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    seconds = time.perf_counter() - started
+    return {
+        'tasks': len(symbols),
+        'seconds': seconds,
+        'tasks_per_second': len(symbols) / seconds,
+        'task_seconds': timing_stats([task_seconds for task_seconds, _ in results]),
+        'max_child_rss_kib': max(rss for _, rss in results),
+    }
+
+
+def benchmark_workers(tickers, years):
+    # fresh child per task without persistent connections (the old CELERYD_MAX_TASKS_PER_CHILD = 1)
+    # against one reused child keeping its connection and provider; expects an isolated database
+    # that other processes can open, i.e. not an in-memory SQLite one
+    conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+    symbols = synthetic_symbols(tickers)
+    with override_settings(QUOTE_PROVIDER='tickers.benchmarks.SyntheticQuoteProvider',
+                           WEEKS_TO_DOWNLOAD=52 * years):
+        update_ticker_data(settings.INDEX_TICKER)
+        for symbol in symbols:
+            update_ticker_data(symbol, update_index=False)
+        try:
+            return {
+                'tickers': tickers,
+                'years': years,
+                'per_task_child': benchmark_worker_mode(symbols, 1, 0),
+                'reused_child': benchmark_worker_mode(symbols, None, settings.DATABASES['default']['CONN_MAX_AGE']),
+            }
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+
+# what each kind of process imports before it can do any work
+STARTUP_TARGETS = {
+    'manage.py check': 'import django; django.setup(); '
+                       'from django.core.management import call_command; call_command("check")',
+    'uwsgi app': 'from stockpicker.wsgi import application; '
+                 'from django.urls import get_resolver; get_resolver().url_patterns',
+    'celery worker': 'from stockpicker.celery import app; app.loader.import_default_modules()',
+}
+
+# imports that should only happen on the code paths that need them
+HEAVY_MODULES = ['pandas', 'pandas_datareader', 'scipy', 'matplotlib']
+
+
+# appended to every target; VmHWM is the peak RSS of the new process image only, whereas
+# ru_maxrss on Linux carries over the RSS of the process that forked it
+STARTUP_REPORT = (
+    '; import sys; print("loaded:" + ",".join(m for m in {0!r} if m in sys.modules))'
+    '; print("peak:" + [line.split()[1] for line in open("/proc/self/status") if line.startswith("VmHWM")][0])'
+).format(HEAVY_MODULES)
+
+
+def measure_startup(code):
+    # wall time and peak RSS (KiB) of a fresh interpreter running code, and which heavy modules it loaded
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', code + STARTUP_REPORT], cwd=settings.BASE_DIR,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    seconds = time.perf_counter() - started
+    report = dict(line.split(':', 1) for line in process.stdout.decode('utf-8').splitlines()
+                  if line.startswith(('loaded:', 'peak:')))
+    return seconds, int(report['peak']), [name for name in report['loaded'].split(',') if name]
+
+
+def benchmark_startup(rounds):
+    report = {
+        'generated': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'targets': {},
+    }
+    for name, code in STARTUP_TARGETS.items():
+        results = [measure_startup(code) for _ in range(rounds)]
+        report['targets'][name] = {
+            'seconds': timing_stats([seconds for seconds, _, _ in results]),
+            'max_rss_kib': max(rss for _, rss, _ in results),
+            'heavy_modules': results[-1][2],
+        }
+    return report
+
+
+def startup_regressions(previous, current, tolerance):
+    # targets whose median start time or peak RSS grew by more than tolerance (0.2 is 20%)
+    regressions = []
+    for name, result in sorted(current['targets'].items()):
+        before = previous['targets'].get(name)
+        if before is None:
+            continue
+        for metric, old, new in (('seconds', before['seconds']['median'], result['seconds']['median']),
+                                 ('max_rss_kib', before['max_rss_kib'], result['max_rss_kib'])):
+            if new > old * (1 + tolerance):
+                regressions.append('{0}: {1} {2:.3f} -> {3:.3f}'.format(name, metric, old, new))
+    return regressions
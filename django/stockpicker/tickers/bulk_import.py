@@ -0,0 +1,196 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from tickers.models import Ticker, Quote, LatestSignal, WindowSignal, QuoteSeries
+from tickers.signals import compute_signals, signal_windows, moving_averages, as_date_array
+from tickers.index_cache import index_adj_close_for, invalidate_index_series
+from tickers.response_cache import invalidate_ticker_responses
+from tickers.series import refresh_quote_series
+from tickers.utility import BASE_QUOTE_FIELDS, DERIVED_QUOTE_FIELDS, merge_quotes, write_quotes, frame_to_quotes
+
+
+def use_copy():
+    # COPY into a staging table, then UPDATE ... FROM and INSERT ... WHERE NOT EXISTS
+    # (PostgreSQL 9.4 has no ON CONFLICT); other databases go through the ORM
+    return connection.vendor == 'postgresql'
+
+
+def column(field):
+    return Quote._meta.get_field(field).column
+
+
+def normalize_frame(frame):
+    # OHLCV files without an adjusted close are taken as already adjusted
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+    if 'Adj Close' not in frame.columns:
+        frame = frame.assign(**{'Adj Close': frame['Close']})
+    frame = frame[frame['Adj Close'].notnull()]
+    return frame.reindex(columns=list(BASE_QUOTE_FIELDS.values())).fillna(0)
+
+
+def ensure_tickers(symbols):
+    existing = dict(Ticker.objects.filter(symbol__in=symbols).values_list('symbol', 'id'))
+    Ticker.objects.bulk_create([Ticker(symbol=symbol) for symbol in symbols if symbol not in existing])
+    return dict(Ticker.objects.filter(symbol__in=symbols).values_list('symbol', 'id'))
+
+
+def copy_frame(cursor, table, frame):
+    # the frame's index becomes the first column
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, date_format='%Y-%m-%d')
+    buffer.seek(0)
+    columns = [frame.index.name] + list(frame.columns)
+    cursor.copy_expert('COPY {0} ({1}) FROM STDIN WITH (FORMAT csv)'.format(table, ', '.join(columns)), buffer)
+
+
+def copy_base_quotes(frames, ticker_ids):
+    table = Quote._meta.db_table
+    fields = list(BASE_QUOTE_FIELDS)
+    names = {name: field for field, name in BASE_QUOTE_FIELDS.items()}
+    staged = pd.concat([frame.rename(columns=names).assign(ticker_id=ticker_ids[symbol])
+                        for symbol, frame in frames.items()])
+    staged.index.name = 'date'
+
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TEMPORARY TABLE quote_import (date date, ticker_id integer, {0}) ON COMMIT DROP'.format(
+            ', '.join('{0} double precision'.format(column(field)) for field in fields)))
+        copy_frame(cursor, 'quote_import', staged[['ticker_id'] + fields])
+        # keeps concurrent writers from inserting the same (ticker, date) between the two statements
+        cursor.execute('LOCK TABLE {0} IN SHARE ROW EXCLUSIVE MODE'.format(table))
+        cursor.execute('UPDATE {0} q SET {1} FROM quote_import s '
+                       'WHERE q.ticker_id = s.ticker_id AND q.date = s.date'.format(
+                           table, ', '.join('{0} = s.{0}'.format(column(field)) for field in fields)))
+        # the derived fields are filled in by recompute_ticker_signals()
+        cursor.execute('INSERT INTO {0} (created, date, ticker_id, {1}, {2}) '
+                       'SELECT %s, s.date, s.ticker_id, {3}, {4} FROM quote_import s '
+                       'WHERE NOT EXISTS (SELECT 1 FROM {0} q WHERE q.ticker_id = s.ticker_id AND q.date = s.date)'.format(
+                           table,
+                           ', '.join(column(field) for field in fields),
+                           ', '.join(column(field) for field in DERIVED_QUOTE_FIELDS),
+                           ', '.join('s.' + column(field) for field in fields),
+                           ', '.join('0' for _ in DERIVED_QUOTE_FIELDS)), [now()])
+    return len(staged)
+
+
+def write_base_quotes(frames, ticker_ids):
+    count = 0
+    for symbol, frame in frames.items():
+        ticker = Ticker(pk=ticker_ids[symbol], symbol=symbol)
+        write_quotes(merge_quotes(ticker, frame_to_quotes(frame)), fields=list(BASE_QUOTE_FIELDS))
+        count += len(frame)
+    return count
+
+
+def import_base_quotes(frames):
+    # stores the OHLCV columns of {symbol: frame}, creating missing tickers; returns the rows written
+    frames = {symbol: normalize_frame(frame) for symbol, frame in frames.items()}
+    frames = {symbol: frame for symbol, frame in frames.items() if len(frame)}
+    if not frames:
+        return 0
+
+    with transaction.atomic():
+        ticker_ids = ensure_tickers(list(frames))
+        if use_copy():
+            count = copy_base_quotes(frames, ticker_ids)
+        else:
+            count = write_base_quotes(frames, ticker_ids)
+        base_quotes_changed(ticker_ids)
+
+    if settings.INDEX_TICKER in frames:
+        invalidate_index_series()
+    for symbol in frames:
+        invalidate_ticker_responses(symbol)
+    return count
+
+
+def base_quotes_changed(ticker_ids):
+    # COPY and bulk writes skip the Quote receivers, so their clean-up is done here for every
+    # imported ticker, in case the derived fields are not recomputed (import_quotes --skip-recompute)
+    ids = list(ticker_ids.values())
+    Ticker.objects.filter(pk__in=ids).update(cached_latest_quote_date=None)
+    QuoteSeries.objects.filter(ticker_id__in=ids).delete()
+    for ticker in Ticker.objects.filter(pk__in=ids):
+        LatestSignal.refresh(ticker)
+
+
+def copy_derived_fields(ids, signals):
+    table = Quote._meta.db_table
+    staged = pd.DataFrame({field: signals[field] for field in DERIVED_QUOTE_FIELDS},
+                          index=pd.Index(ids, name='id'), columns=DERIVED_QUOTE_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TEMPORARY TABLE signal_import (id integer, {0}) ON COMMIT DROP'.format(
+            ', '.join('{0} double precision'.format(column(field)) for field in DERIVED_QUOTE_FIELDS)))
+        copy_frame(cursor, 'signal_import', staged)
+        cursor.execute('UPDATE {0} q SET {1} FROM signal_import s WHERE q.id = s.id'.format(
+            table, ', '.join('{0} = s.{0}'.format(column(field)) for field in DERIVED_QUOTE_FIELDS)))
+
+
+def write_derived_fields(ids, signals):
+    quotes = [Quote(pk=pk) for pk in ids]
+    for field in DERIVED_QUOTE_FIELDS:
+        for quote, value in zip(quotes, signals[field].tolist()):
+            setattr(quote, field, value)
+    write_quotes(quotes, fields=DERIVED_QUOTE_FIELDS)
+
+
+def recompute_ticker_signals(symbol):
+    # every derived field of one ticker from its stored quotes; returns (symbol, quotes, error).
+    # Module-level so run_in_processes() can hand it to worker processes.
+    ticker = Ticker.objects.filter(symbol=symbol).first()
+    if ticker is None:
+        return symbol, 0, 'Ticker "{0}" does not exist'.format(symbol)
+
+    with transaction.atomic():
+        # serialize with the update pipeline writing the same ticker
+        Ticker.objects.select_for_update().filter(pk=ticker.pk).first()
+
+        rows = list(ticker.quote_set.order_by('date').values_list('id', 'date', 'adj_close'))
+        if not rows:
+            return symbol, 0, None
+        ids, dates, adj_close = zip(*rows)
+
+        if symbol == settings.INDEX_TICKER:
+            index_adj_close = adj_close
+        else:
+            try:
+                index_adj_close = index_adj_close_for(dates)
+            except KeyError as e:
+                return symbol, 0, str(e)
+
+        signals = compute_signals(dates, adj_close, index_adj_close, windows=signal_windows())
+        WindowSignal.replace(ticker, dates, signals.pop('windows'))
+        signals['quotes_in_moving_average'] = signals['quotes_in_moving_average'].astype(np.int64)
+        if use_copy():
+            copy_derived_fields(ids, signals)
+        else:
+            write_derived_fields(ids, signals)
+
+        LatestSignal.refresh(ticker)
+        ticker.set_latest_quote_date(dates[-1])
+        if settings.QUOTE_SERIES_STORAGE == 'packed':
+            refresh_quote_series(ticker)
+
+    invalidate_ticker_responses(symbol)
+    return symbol, len(rows), None
+
+
+def recompute_ticker_windows(work):
+    # (symbol, windows): the WindowSignal rows of those windows from the stored scaled_adj_close,
+    # without downloading or rewriting any Quote; returns (symbol, quotes)
+    symbol, windows = work
+    ticker = Ticker.objects.get(symbol=symbol)
+    with transaction.atomic():
+        Ticker.objects.select_for_update().filter(pk=ticker.pk).first()
+        rows = list(ticker.quote_set.order_by('date').values_list('date', 'scaled_adj_close'))
+        if rows:
+            dates, scaled_adj_close = zip(*rows)
+            averages = moving_averages(as_date_array(dates), np.asarray(scaled_adj_close, dtype=np.float64), windows)
+            WindowSignal.replace(ticker, dates, averages)
+    invalidate_ticker_responses(symbol)
+    return symbol, len(rows)
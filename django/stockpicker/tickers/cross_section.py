@@ -0,0 +1,118 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.timezone import timedelta
+
+from tickers.models import Ticker, Quote, WindowSignal
+from tickers.response_cache import data_version
+
+# weeks -> (version, RatioMatrix), the current matrix of each window in this process
+_local_matrices = {}
+
+
+class RatioMatrix(object):
+
+    # every ticker's sac_to_sacma_ratio over the last CROSS_SECTION_WEEKS as one float32
+    # (dates x tickers) array, NaN where a ticker has no ratio on a date
+    def __init__(self, dates, symbols, ratios):
+        self.dates = dates
+        self.symbols = symbols
+        self.ratios = ratios
+
+    def row(self, day=None):
+        # the row of the latest date on or before day; None if day is before the first date
+        if day is None:
+            return len(self.dates) - 1 if len(self.dates) else None
+        row = np.searchsorted(self.dates, np.datetime64(day, 'D'), side='right') - 1
+        return int(row) if row >= 0 else None
+
+    def percentiles(self, row):
+        # the share of the date's tickers with a lower ratio, 0 to 100
+        ratios = self.ratios[row]
+        valid = ~np.isnan(ratios)
+        percentiles = np.full(len(ratios), np.nan)
+        order = np.argsort(ratios[valid], kind='mergesort')
+        ranks = np.empty(len(order))
+        ranks[order] = np.arange(len(order))
+        percentiles[valid] = 100 * ranks / max(len(order) - 1, 1)
+        return percentiles
+
+    def days_since_cross(self, row):
+        # trading days each ticker has been on its side of 1, up to row; -1 if it has not crossed
+        # within the matrix. Missing days neither cross nor break a run.
+        history = self.ratios[:row + 1]
+        valid = ~np.isnan(history)
+        with np.errstate(invalid='ignore'):
+            above = history > 1
+        crossed = valid & (above != above[-1])
+        # rows back from `row` to the latest day on the other side
+        back = crossed[::-1].argmax(axis=0)
+        return np.where(crossed.any(axis=0), back - 1, -1)
+
+    def ranking(self, row, count):
+        # the `count` highest and lowest ratios of the date, each highest first / lowest first
+        ratios = self.ratios[row]
+        valid = np.flatnonzero(~np.isnan(ratios))
+        order = valid[np.argsort(ratios[valid], kind='mergesort')]
+        return order[::-1][:count], order[:count]
+
+    def hit_counts(self):
+        # per date: tickers above 1 (sell hits) and between 0 and 1 (buy hits)
+        with np.errstate(invalid='ignore'):
+            return (self.ratios > 1).sum(axis=1), (self.ratios < 1).sum(axis=1)
+
+
+def ratio_source(weeks):
+    if weeks == settings.MOVING_AVERAGE_WEEKS:
+        return Quote.objects.all()
+    return WindowSignal.objects.filter(weeks=weeks)
+
+
+def ratio_matrix_version(weeks):
+    # a new latest date, or any ticker's quotes being rewritten, makes a new matrix
+    latest_date = Quote.objects.aggregate(latest=Max('date'))['latest']
+    return weeks, latest_date, data_version()
+
+
+def load_ratio_matrix(weeks, latest_date):
+    # one query for every ticker, the index excluded (its ratio is always 1)
+    rows = list(ratio_source(weeks)
+                .filter(date__gte=latest_date - timedelta(weeks=settings.CROSS_SECTION_WEEKS), sac_to_sacma_ratio__gt=0)
+                .exclude(ticker__symbol=settings.INDEX_TICKER)
+                .values_list('date', 'ticker_id', 'sac_to_sacma_ratio'))
+    dates, date_rows = np.unique(np.array([row[0] for row in rows], dtype='datetime64[D]'), return_inverse=True)
+    ticker_ids, ticker_columns = np.unique(np.array([row[1] for row in rows], dtype=np.int64), return_inverse=True)
+
+    ratios = np.full((len(dates), len(ticker_ids)), np.nan, dtype=np.float32)
+    ratios[date_rows, ticker_columns] = [row[2] for row in rows]
+
+    symbols = dict(Ticker.objects.filter(pk__in=ticker_ids.tolist()).values_list('id', 'symbol'))
+    return RatioMatrix(dates, [symbols[ticker_id] for ticker_id in ticker_ids.tolist()], ratios)
+
+
+def ratio_matrix_cache_key(version):
+    return 'ratio-matrix:{0}:{1}:{2}'.format(*version)
+
+
+def get_ratio_matrix(weeks=None):
+    # None when there are no quotes at all
+    if weeks is None:
+        weeks = settings.MOVING_AVERAGE_WEEKS
+    version = ratio_matrix_version(weeks)
+    if version[1] is None:
+        return None
+
+    local = _local_matrices.get(weeks)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = ratio_matrix_cache_key(version)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = load_ratio_matrix(weeks, version[1])
+        cache.set(key, matrix, settings.CROSS_SECTION_CACHE_SECONDS)
+
+    _local_matrices[weeks] = (version, matrix)
+    return matrix
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def bucket_edges(length, buckets):
+    # the first and last points get buckets of their own
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keep the point of each bucket that forms the largest
+    # triangle with the point kept before it and the average of the next bucket
+    length = len(y)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = bucket_edges(length, threshold - 2)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = length - 1, length
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        # twice each triangle's area, from the cross product of two of its sides
+        cross = (x[previous] - next_x) * (y[start:end] - y[previous])
+        areas = np.abs(cross - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def minmax_indices(y, threshold):
+    # the lowest and highest point of each bucket, so spikes survive downsampling
+    length = len(y)
+    if threshold >= length or threshold < 4:
+        return np.arange(length)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = bucket_edges(length, (threshold - 2) // 2)
+    indices = [0, length - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            indices.append(start + int(np.argmin(y[start:end])))
+            indices.append(start + int(np.argmax(y[start:end])))
+    return np.unique(indices)
+
+
+def downsample(series, threshold, method='lttb', key='sac'):
+    if method == 'minmax':
+        indices = minmax_indices(series[key], threshold)
+    else:
+        indices = lttb_indices(series['date'].astype(np.int64), series[key], threshold)
+    return {name: values[indices] for name, values in series.items()}
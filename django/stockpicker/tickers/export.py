@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+
+from tickers.models import Quote
+
+EXPORT_FIELDS = [
+    'date', 'open', 'high', 'low', 'close', 'volume', 'adj_close',
+    'index_adj_close', 'scaled_adj_close', 'sac_moving_average', 'sac_to_sacma_ratio',
+]
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# rows joined into each chunk handed to the response or file
+ROWS_PER_CHUNK = 500
+
+
+def export_rows(symbols=None, start=None, end=None):
+    # (symbol, date, ...EXPORT_FIELDS[1:]) tuples, streamed from a server-side cursor in
+    # (ticker, date) order, which the unique (ticker, date) index already provides
+    quotes = Quote.objects.all()
+    if symbols:
+        quotes = quotes.filter(ticker__symbol__in=symbols)
+    if start is not None:
+        quotes = quotes.filter(date__gte=start)
+    if end is not None:
+        quotes = quotes.filter(date__lte=end)
+    quotes = quotes.order_by('ticker_id', 'date').values_list('ticker__symbol', *EXPORT_FIELDS)
+    return quotes.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['symbol'] + EXPORT_FIELDS)
+    for chunk in chunked(rows):
+        writer.writerows([symbol, date.isoformat()] + values for symbol, date, *values in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # only the header is left when there were no rows
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(rows):
+    names = ['symbol'] + EXPORT_FIELDS
+    for chunk in chunked(rows):
+        yield ''.join(json.dumps(dict(zip(names, [symbol, date.isoformat()] + values))) + '\n'
+                      for symbol, date, *values in chunk)
+
+
+EXPORT_WRITERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+}
+
+
+def gzip_chunks(chunks):
+    # one gzip member, compressed as the chunks are produced
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(rows, output='csv', compress=False):
+    chunks = EXPORT_WRITERS[output](rows)
+    if compress:
+        return gzip_chunks(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
+
+
+def export_file_name(output, compress):
+    return 'quotes.{0}{1}'.format(output, '.gz' if compress else '')
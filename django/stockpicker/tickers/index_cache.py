@@ -0,0 +1,69 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from tickers.models import Quote
+
+INDEX_SERIES_GENERATION_KEY = 'index-series-generation'
+
+# (latest index quote date, generation) -> (dates, adj_close), shared by every task in this process
+_local_series = {}
+
+
+def index_series_version():
+    # the generation changes whenever the index is rewritten, even if its latest date does not
+    latest_date = Quote.objects.filter(ticker__symbol=settings.INDEX_TICKER).aggregate(latest=Max('date'))['latest']
+    return latest_date, cache.get(INDEX_SERIES_GENERATION_KEY, 0)
+
+
+def index_series_cache_key(version):
+    return 'index-series:{0}:{1}:{2}'.format(settings.INDEX_TICKER, version[0], version[1])
+
+
+def load_index_series():
+    rows = list(Quote.objects.filter(ticker__symbol=settings.INDEX_TICKER)
+                .order_by('date').values_list('date', 'adj_close'))
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    adj_close = np.array([row[1] for row in rows], dtype=np.float64)
+    return dates, adj_close
+
+
+def get_index_series():
+    version = index_series_version()
+
+    series = _local_series.get(version)
+    if series is not None:
+        return series
+
+    key = index_series_cache_key(version)
+    if settings.INDEX_SERIES_SHARED_CACHE:
+        series = cache.get(key)
+
+    if series is None:
+        series = load_index_series()
+        if settings.INDEX_SERIES_SHARED_CACHE:
+            cache.set(key, series, settings.INDEX_SERIES_CACHE_SECONDS)
+
+    # only the current version is worth keeping
+    _local_series.clear()
+    _local_series[version] = series
+    return series
+
+
+def invalidate_index_series():
+    _local_series.clear()
+    cache.add(INDEX_SERIES_GENERATION_KEY, 0, None)
+    cache.incr(INDEX_SERIES_GENERATION_KEY)
+
+
+def index_adj_close_for(dates):
+    index_dates, index_adj_close = get_index_series()
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    positions = np.searchsorted(index_dates, dates)
+    found = positions < len(index_dates)
+    found[found] = index_dates[positions[found]] == dates[found]
+    if not found.all():
+        raise KeyError('No {0} quote for {1}'.format(settings.INDEX_TICKER, dates[~found][0]))
+    return index_adj_close[positions]
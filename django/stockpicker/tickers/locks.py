@@ -0,0 +1,117 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tickers.metrics import metric_key, increment
+
+
+class LockLost(Exception):
+    pass
+
+
+class LeaseLock(object):
+
+    # a lock held in the shared cache under a short lease that a background thread keeps
+    # renewing while the work runs, so a crashed worker frees it within one lease.
+    # Every acquisition gets a new, larger fencing token; writers check it against the
+    # token stored with the data (Ticker.claim_fencing_token) so a holder whose lease
+    # ran out can never overwrite the work of the one that took over.
+    def __init__(self, name, kind, lease_seconds=None, wait_seconds=0):
+        self.name = name
+        self.kind = kind
+        self.lease_seconds = lease_seconds or settings.LOCK_LEASE_SECONDS
+        self.wait_seconds = wait_seconds
+        self.token = None
+        self.lost = False
+        self._stop = threading.Event()
+        self._renewer = None
+
+    @property
+    def key(self):
+        return 'lock:{0}'.format(self.name)
+
+    @property
+    def held(self):
+        return self.token is not None and not self.lost
+
+    def next_token(self):
+        # seeded from the clock, so tokens keep increasing even if the counter is evicted
+        key = 'lock-fence:{0}'.format(self.name)
+        cache.add(key, int(time.time() * 1000), None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            return self.next_token()
+
+    def acquire(self):
+        started = time.perf_counter()
+        deadline = started + self.wait_seconds
+        acquired = cache.add(self.key, 0, self.lease_seconds)
+        while not acquired and time.perf_counter() < deadline:
+            time.sleep(settings.LOCK_POLL_SECONDS)
+            acquired = cache.add(self.key, 0, self.lease_seconds)
+        increment(metric_key('lock', 'wait_microseconds', self.kind), int((time.perf_counter() - started) * 1e6))
+        increment(metric_key('lock', 'acquired' if acquired else 'contended', self.kind), 1)
+        if not acquired:
+            return False
+
+        # drawn only once the lock is ours, so it is larger than that of every holder before us,
+        # however long we waited
+        self.token = self.next_token()
+        cache.set(self.key, self.token, self.lease_seconds)
+        self._renewer = threading.Thread(target=self.keep_renewed, name=self.key, daemon=True)
+        self._renewer.start()
+        return True
+
+    def renew(self):
+        # get then set is not atomic, but losing that race only costs the work being redone:
+        # the fencing token still keeps the stale holder from writing
+        if cache.get(self.key) != self.token:
+            self.lost = True
+            increment(metric_key('lock', 'lost', self.kind), 1)
+            print('Lost the lock on {0}'.format(self.name))
+            return False
+        cache.set(self.key, self.token, self.lease_seconds)
+        return True
+
+    def keep_renewed(self):
+        while not self._stop.wait(self.lease_seconds / 3.0):
+            if not self.renew():
+                return
+
+    def check(self, ticker):
+        # inside the writing transaction, after the ticker row has been locked
+        if self.lost or not ticker.claim_fencing_token(self.token):
+            increment(metric_key('lock', 'fenced', self.kind), 1)
+            raise LockLost('The lock on {0} was taken over by another worker'.format(self.name))
+
+    def release(self):
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+        if self.token is not None and cache.get(self.key) == self.token:
+            cache.delete(self.key)
+        self.token = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def index_lock(wait_seconds=None):
+    # every ticker is scaled by the index, so callers wait for a refresh in progress rather than skip it
+    if wait_seconds is None:
+        wait_seconds = settings.LOCK_WAIT_SECONDS
+    return LeaseLock('index:{0}'.format(settings.INDEX_TICKER), 'index', wait_seconds=wait_seconds)
+
+
+def ticker_lock(symbol, wait_seconds=0):
+    # the index always goes through index_lock(), so its fencing tokens come from one counter
+    if symbol == settings.INDEX_TICKER:
+        return index_lock(wait_seconds)
+    return LeaseLock('ticker:{0}'.format(symbol), 'ticker', wait_seconds=wait_seconds)
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+
+from django.core.management import BaseCommand
+from django.conf import settings
+from django.db import connection
+
+from tickers.benchmarks import isolated_database
+from tickers.models import Ticker, Quote
+from tickers.signals import compute_signals
+from tickers.management.commands.benchmark_signals import synthetic_series, best_of
+
+# a scratch copy of the quote rows with only the quote indexes of 0001_initial: the ForeignKey
+# and db_index=True single-column ones, without the (ticker, date) unique index of 0002 or the
+# (date, ratio) index of 0005
+BASELINE_TABLE = 'quote_baseline'
+BASELINE_INDEX_COLUMNS = ['ticker_id', 'date']
+
+
+@contextmanager
+def baseline_table():
+    # the quote table and model are left alone; the baseline queries are pointed at the copy
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE {0} AS SELECT * FROM {1}'.format(
+            quote_name(BASELINE_TABLE), quote_name(Quote._meta.db_table)))
+        for column in BASELINE_INDEX_COLUMNS:
+            cursor.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                quote_name('{0}_{1}'.format(BASELINE_TABLE, column)), quote_name(BASELINE_TABLE), quote_name(column)))
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE {0}'.format(quote_name(BASELINE_TABLE)))
+
+
+def query_sql(queryset, quote_table):
+    # the queryset's SQL, reading quotes from quote_table
+    sql, params = queryset.query.sql_with_params()
+    quote_name = connection.ops.quote_name
+    return sql.replace(quote_name(Quote._meta.db_table), quote_name(quote_table)), params
+
+
+def fetch_all(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def seed_quotes(tickers, years):
+    index_dates, index_adj_close, _ = synthetic_series(years, seed=0)
+    for number in range(tickers):
+        ticker = Ticker.objects.create(symbol='SYN{0:05d}'.format(number))
+        _, adj_close, _ = synthetic_series(years, seed=number + 1)
+        signals = compute_signals(index_dates, adj_close, index_adj_close)
+        quotes = [Quote(ticker=ticker, date=date, adj_close=adj_close[i], close=adj_close[i],
+                        index_adj_close=signals['index_adj_close'][i],
+                        scaled_adj_close=signals['scaled_adj_close'][i],
+                        sac_moving_average=signals['sac_moving_average'][i],
+                        sac_to_sacma_ratio=signals['sac_to_sacma_ratio'][i],
+                        quotes_in_moving_average=signals['quotes_in_moving_average'][i])
+                  for i, date in enumerate(index_dates.tolist())]
+        Quote.objects.bulk_create(quotes, batch_size=settings.QUOTE_WRITE_BATCH_SIZE)
+    return index_dates
+
+
+def hot_queries(ticker, date):
+    # the query shapes the update pipeline and the views run most
+    return [
+        ('ticker series', Quote.objects.filter(ticker=ticker).order_by('date')
+            .values_list('date', 'adj_close', 'sac_to_sacma_ratio')),
+        ('latest two dates', Quote.objects.filter(ticker=ticker).order_by('-date')
+            .values_list('date', flat=True)[:2]),
+        ('ratio scan', Quote.objects.filter(date=date, sac_to_sacma_ratio__gt=1)
+            .order_by('-sac_to_sacma_ratio').values_list('ticker_id', 'sac_to_sacma_ratio')[:25]),
+        ('stale tickers', Ticker.objects.stale(date).values_list('symbol', flat=True)),
+    ]
+
+
+class Command(BaseCommand):
+
+    help = ('Seed synthetic quotes into a throwaway database and report query plans and latencies '
+            'with the original single-column quote indexes and with the current ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', type=int, default=500)
+        parser.add_argument('--years', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with isolated_database(options['keepdb']):
+            self.run_benchmark(options)
+
+    def run_benchmark(self, options):
+        if not Quote.objects.exists():
+            print('Seeding {0} tickers x {1} years...'.format(options['tickers'], options['years']))
+            seed_quotes(options['tickers'], options['years'])
+        print('{0} quotes'.format(Quote.objects.count()))
+
+        ticker = Ticker.objects.order_by('symbol')[Ticker.objects.count() // 2]
+        dates = Quote.objects.filter(ticker=ticker).order_by('date').values_list('date', flat=True)
+        date = dates[len(dates) // 2]
+
+        results = {}
+        with baseline_table():
+            self.time_queries('before', BASELINE_TABLE, ticker, date, options['repeat'], results)
+        self.time_queries('after', Quote._meta.db_table, ticker, date, options['repeat'], results)
+
+        print('\n{0:>18} {1:>12} {2:>12} {3:>9}'.format('query', 'before (ms)', 'after (ms)', 'speedup'))
+        for name, seconds in results.items():
+            print('{0:>18} {1:>12.2f} {2:>12.2f} {3:>8.1f}x'.format(
+                name, seconds['before'] * 1000, seconds['after'] * 1000,
+                seconds['before'] / seconds['after']))
+
+    def time_queries(self, phase, quote_table, ticker, date, repeat, results):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        print('\n== {0} =='.format(phase))
+        for name, queryset in hot_queries(ticker, date):
+            sql, params = query_sql(queryset, quote_table)
+            seconds, _ = best_of(repeat, fetch_all, sql, params)
+            results.setdefault(name, {})[phase] = seconds
+            print('\n{0}: {1:.2f} ms'.format(name, seconds * 1000))
+            plan = fetch_all('{0} {1}'.format(connection.ops.explain_query_prefix(), sql), params)
+            print('\n'.join(' '.join(str(column) for column in row) for row in plan))
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+
+from django.core.management import BaseCommand
+from django.conf import settings
+
+from tickers.signals import compute_signals, legacy_moving_average, signal_windows
+
+
+def synthetic_series(years, seed=0):
+    random = np.random.RandomState(seed)
+    end = np.datetime64('2019-05-10')
+    days = np.arange(end - np.timedelta64(365 * years, 'D'), end + 1, dtype='datetime64[D]')
+    dates = days[np.is_busday(days)]
+    adj_close = 50 * np.exp(np.cumsum(random.normal(0, 0.02, len(dates))))
+    index_adj_close = 250 * np.exp(np.cumsum(random.normal(0, 0.01, len(dates))))
+    return dates, adj_close, index_adj_close
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+
+    help = 'Compare the vectorized moving-average engine against the legacy per-quote loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, nargs='+', default=[5, 20])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        weeks = settings.MOVING_AVERAGE_WEEKS
+        # every configured window at once, up to the largest, as the update pipeline computes them
+        windows = signal_windows()
+        print('{0:>6} {1:>8} {2:>12} {3:>12} {4:>9} {5:>10} {6:>12}'.format(
+            'years', 'quotes', 'legacy (s)', 'vector (s)', 'speedup', 'max diff', 'windows (s)'))
+        for years in options['years']:
+            dates, adj_close, index_adj_close = synthetic_series(years)
+
+            vector_seconds, signals = best_of(options['repeat'], compute_signals,
+                                              dates, adj_close, index_adj_close, weeks)
+
+            legacy_seconds, (legacy_average, legacy_counts) = best_of(
+                options['repeat'], legacy_moving_average,
+                dates.tolist(), signals['scaled_adj_close'].tolist(), weeks)
+
+            assert legacy_counts == signals['quotes_in_moving_average'].tolist()
+            assert legacy_average == signals['sac_moving_average'].tolist()
+            max_diff = np.max(np.abs(np.asarray(legacy_average) - signals['sac_moving_average']))
+
+            windows_seconds, _ = best_of(options['repeat'], compute_signals,
+                                         dates, adj_close, index_adj_close, weeks, windows)
+
+            print('{0:>6} {1:>8} {2:>12.4f} {3:>12.4f} {4:>8.0f}x {5:>10.1e} {6:>12.4f}'.format(
+                years, len(dates), legacy_seconds, vector_seconds, legacy_seconds / vector_seconds, max_diff,
+                windows_seconds))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from tickers.benchmarks import benchmark_startup, startup_regressions
+
+
+class Command(BaseCommand):
+
+    help = ('Measure the start time and peak RSS of fresh manage.py, uWSGI app and Celery worker '
+            'processes, optionally failing on a regression against a previous report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--output', default='startup-report.json')
+        parser.add_argument('--compare', default=None, help='A previous report to check for regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed growth of the median start time and of the peak RSS.')
+
+    def handle(self, *args, **options):
+        report = benchmark_startup(options['rounds'])
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, result in sorted(report['targets'].items()):
+            print('{0:>16}: median {1:.0f} ms, peak RSS {2:.0f} MiB, heavy modules: {3}'.format(
+                name, result['seconds']['median'] * 1000, result['max_rss_kib'] / 1024,
+                ', '.join(result['heavy_modules']) or 'none'))
+        print('Wrote {0}'.format(options['output']))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = startup_regressions(json.load(f), report, options['tolerance'])
+            if regressions:
+                raise CommandError('Startup regressions:\n' + '\n'.join(regressions))
+            print('No regressions against {0}'.format(options['compare']))
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from tickers.benchmarks import isolated_database, run_suite
+
+
+def parse_size(value):
+    # "<tickers>x<years>"
+    try:
+        tickers, years = value.lower().split('x')
+        return int(tickers), int(years)
+    except ValueError:
+        raise CommandError('Invalid size "{0}", expected <tickers>x<years> such as 50x5'.format(value))
+
+
+def compare_reports(previous, current):
+    # median latency ratios for every endpoint measured in both reports
+    sizes = {(size['tickers'], size['years']): size for size in previous['sizes']}
+    for size in current['sizes']:
+        before = sizes.get((size['tickers'], size['years']))
+        if before is None:
+            continue
+        print('\n{0} tickers x {1} years'.format(size['tickers'], size['years']))
+        for name, result in sorted(size['endpoints'].items()):
+            for state in ('cold', 'warm'):
+                old = before['endpoints'].get(name, {}).get(state)
+                if old:
+                    print('{0:>24} {1:>5} {2:>10.2f} ms -> {3:>8.2f} ms ({4:+.0%})'.format(
+                        name, state, old['median'] * 1000, result[state]['median'] * 1000,
+                        result[state]['median'] / old['median'] - 1))
+
+
+class Command(BaseCommand):
+
+    help = ('Run the update pipeline and the API endpoints against deterministic synthetic quotes '
+            'in a throwaway database, and write a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', default=['10x1', '50x5', '200x20'],
+                            help='<tickers>x<years> data sizes.')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--compare', default=None, help='A previous report to compare medians with.')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        sizes = [parse_size(size) for size in options['sizes']]
+
+        with isolated_database(options['keepdb']):
+            report = run_suite(sizes, options['rounds'])
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for size in report['sizes']:
+            pipeline = size['pipeline']
+            print('{0} tickers x {1} years: {2:.1f} tickers/s, {3:.0f} rows/s, p95 {4:.3f}s per ticker'.format(
+                size['tickers'], size['years'], pipeline['tickers_per_second'], pipeline['rows_per_second'],
+                pipeline['ticker_seconds']['p95']))
+            for name, result in sorted(size['endpoints'].items()):
+                print('{0:>24}: cold {1:.2f} ms, warm {2:.2f} ms'.format(
+                    name, result['cold']['median'] * 1000, result['warm']['median'] * 1000))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                compare_reports(json.load(f), report)
+
+        print('Wrote {0}'.format(options['output']))
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management import BaseCommand
+
+from tickers.benchmarks import isolated_database, benchmark_workers
+from tickers.management.commands.benchmark_stockpicker import parse_size
+
+
+class Command(BaseCommand):
+
+    help = ('Compare incremental ticker updates per second in a worker child replaced after every task '
+            'with one reused child, against synthetic quotes in a throwaway database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='50x5', help='<tickers>x<years>.')
+        parser.add_argument('--output', default=None, help='Also write the results as JSON.')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        tickers, years = parse_size(options['size'])
+
+        with isolated_database(options['keepdb']):
+            report = benchmark_workers(tickers, years)
+
+        for mode in ('per_task_child', 'reused_child'):
+            result = report[mode]
+            print('{0:>15}: {1:.1f} tasks/s, median {2:.1f} ms per task, peak child RSS {3:.0f} MiB'.format(
+                mode, result['tasks_per_second'], result['task_seconds']['median'] * 1000,
+                result['max_child_rss_kib'] / 1024))
+        print('Speedup: {0:.2f}x'.format(
+            report['reused_child']['tasks_per_second'] / report['per_task_child']['tasks_per_second']))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            print('Wrote {0}'.format(options['output']))
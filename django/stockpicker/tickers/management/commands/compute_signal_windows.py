@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from tickers.bulk_import import recompute_ticker_windows
+from tickers.models import Ticker
+from tickers.parallel import run_in_processes
+from tickers.signals import signal_windows
+
+
+class Command(BaseCommand):
+
+    help = ('Compute the WindowSignal rows of configured moving-average windows from the stored quotes, '
+            'e.g. after adding a window to SIGNAL_WINDOWS_WEEKS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, nargs='+', default=None, help='Defaults to every configured window.')
+        parser.add_argument('--symbols', nargs='+', default=None, help='Defaults to every ticker.')
+        parser.add_argument('--missing', action='store_true',
+                            help='Only tickers that have quotes but no rows for a window yet.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        windows = options['weeks'] or signal_windows()
+        unknown = set(windows) - set(signal_windows())
+        if unknown:
+            raise CommandError('Not in SIGNAL_WINDOWS_WEEKS (or stored on Quote): {0}'.format(
+                ', '.join(str(weeks) for weeks in sorted(unknown))))
+
+        tickers = Ticker.objects.all()
+        if options['symbols']:
+            tickers = tickers.filter(symbol__in=options['symbols'])
+
+        work = {symbol: [] for symbol in tickers.order_by('symbol').values_list('symbol', flat=True)}
+        for weeks in windows:
+            symbols = tickers
+            if options['missing']:
+                symbols = tickers.filter(quote__isnull=False).exclude(windowsignal__weeks=weeks).distinct()
+            for symbol in symbols.values_list('symbol', flat=True):
+                work[symbol].append(weeks)
+        work = [(symbol, weeks) for symbol, weeks in work.items() if weeks]
+
+        started = time.time()
+        quotes = 0
+        for done, (symbol, count) in enumerate(run_in_processes(recompute_ticker_windows, work, options['workers']), 1):
+            quotes += count
+            if done % 100 == 0 or done == len(work):
+                print('Computed windows for {0}/{1} tickers ({2} quotes) in {3:.1f}s'.format(
+                    done, len(work), quotes, time.time() - started))
+        if not work:
+            print('Every window is up to date')
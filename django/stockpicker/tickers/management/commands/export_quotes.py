@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.timezone import datetime
+
+from tickers.models import Ticker
+from tickers.export import export_rows, export_chunks, EXPORT_CONTENT_TYPES
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError('Invalid date "{0}", expected YYYY-MM-DD'.format(value))
+
+
+class Command(BaseCommand):
+
+    help = 'Stream quotes for some or all tickers as CSV or NDJSON, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', nargs='+', default=[], help='Defaults to every ticker.')
+        parser.add_argument('--start', type=parse_date, default=None)
+        parser.add_argument('--end', type=parse_date, default=None)
+        parser.add_argument('--output', choices=sorted(EXPORT_CONTENT_TYPES), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--file', default=None, help='Defaults to stdout.')
+
+    def handle(self, *args, **options):
+        symbols = options['tickers']
+        missing = set(symbols) - set(Ticker.objects.filter(symbol__in=symbols).values_list('symbol', flat=True))
+        if missing:
+            raise CommandError('Unknown tickers: {0}'.format(', '.join(sorted(missing))))
+
+        chunks = export_chunks(export_rows(symbols, options['start'], options['end']),
+                               options['output'], options['gzip'])
+
+        f = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+        finally:
+            if options['file']:
+                f.close()
+            else:
+                f.flush()
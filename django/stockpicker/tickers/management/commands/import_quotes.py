@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.conf import settings
+
+from tickers.bulk_import import import_base_quotes, recompute_ticker_signals
+from tickers.parallel import run_in_processes
+from tickers.utility import read_quote_files
+
+
+class Command(BaseCommand):
+
+    help = ('Load OHLCV history from local CSV/Parquet files (a directory of <SYMBOL>.csv/.parquet files '
+            'or one file with a Symbol column), then recompute every derived field in parallel.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--symbols', nargs='+', default=None, help='Only import these symbols.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Symbols stored per transaction.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--skip-recompute', action='store_true')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError('{0} does not exist'.format(options['path']))
+
+        started = time.time()
+        frames = read_quote_files(options['path'])
+        if options['symbols']:
+            frames = {symbol: frame for symbol, frame in frames.items() if symbol in options['symbols']}
+        symbols = sorted(frames)
+        print('Read {0} tickers from {1} in {2:.1f}s'.format(len(symbols), options['path'], time.time() - started))
+
+        # the index first, so every other ticker can be scaled by it
+        symbols.sort(key=lambda symbol: symbol != settings.INDEX_TICKER)
+        batch_size = options['batch_size']
+        quotes = 0
+        for i in range(0, len(symbols), batch_size):
+            batch = symbols[i:i + batch_size]
+            quotes += import_base_quotes({symbol: frames.pop(symbol) for symbol in batch})
+            print('Stored {0} quotes for {1}/{2} tickers'.format(quotes, min(i + batch_size, len(symbols)),
+                                                                 len(symbols)))
+
+        if options['skip_recompute']:
+            return
+
+        started = time.time()
+        failed = []
+        for done, (symbol, count, error) in enumerate(
+                run_in_processes(recompute_ticker_signals, symbols, options['workers']), 1):
+            if error:
+                failed.append((symbol, error))
+            if done % 100 == 0 or done == len(symbols):
+                print('Recomputed {0}/{1} tickers in {2:.1f}s'.format(done, len(symbols), time.time() - started))
+
+        for symbol, error in failed:
+            print('Failed {0}: {1}'.format(symbol, error))
+        if failed:
+            raise CommandError('{0} of {1} tickers could not be recomputed'.format(len(failed), len(symbols)))
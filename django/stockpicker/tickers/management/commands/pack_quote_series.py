@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from tickers.models import Ticker, QuoteSeries
+from tickers.parallel import run_in_processes
+from tickers.series import refresh_quote_series
+
+
+def pack_ticker(symbol):
+    # module-level so run_in_processes() can hand it to worker processes
+    refresh_quote_series(Ticker.objects.get(symbol=symbol))
+    return symbol
+
+
+class Command(BaseCommand):
+
+    help = 'Build the QuoteSeries rows read when QUOTE_SERIES_STORAGE is "packed".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', default=None, help='Defaults to every ticker.')
+        parser.add_argument('--missing', action='store_true', help='Only tickers without a QuoteSeries row.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        tickers = Ticker.objects.all()
+        if options['symbols']:
+            tickers = tickers.filter(symbol__in=options['symbols'])
+        if options['missing']:
+            tickers = tickers.filter(quoteseries__isnull=True)
+        symbols = list(tickers.order_by('symbol').values_list('symbol', flat=True))
+
+        started = time.time()
+        for done, _ in enumerate(run_in_processes(pack_ticker, symbols, options['workers']), 1):
+            if done % 100 == 0 or done == len(symbols):
+                print('Packed {0}/{1} tickers in {2:.1f}s'.format(done, len(symbols), time.time() - started))
+
+        packed = QuoteSeries.objects.filter(ticker__symbol__in=symbols).aggregate(
+            quotes=Sum('quotes'), size=Sum(Length('data')))
+        if packed['quotes']:
+            print('{0} quotes in {1:.1f} MiB, {2:.0f} bytes per quote'.format(
+                packed['quotes'], packed['size'] / 2 ** 20, packed['size'] / packed['quotes']))
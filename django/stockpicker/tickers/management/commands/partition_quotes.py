@@ -0,0 +1,85 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.timezone import datetime
+
+from tickers.models import Quote
+
+# declarative partitions with a primary key and foreign keys need PostgreSQL 11
+MINIMUM_SERVER_VERSION = 110000
+
+
+def partition_name(table, year):
+    return '{0}_{1}'.format(table, year)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [table])
+    return cursor.fetchone() is not None
+
+
+def year_partitions(cursor, table, years):
+    for year in years:
+        cursor.execute('CREATE TABLE IF NOT EXISTS {0} PARTITION OF {1} '
+                       "FOR VALUES FROM ('{2}-01-01') TO ('{3}-01-01')".format(
+                           partition_name(table, year), table, year, year + 1))
+
+
+def partition_table(cursor, table, years, keep_old):
+    old_table = table + '_unpartitioned'
+    cursor.execute('ALTER TABLE {0} RENAME TO {1}'.format(table, old_table))
+    # index names are per schema; the partitioned table takes them over
+    cursor.execute('ALTER TABLE {0} DROP CONSTRAINT unique_ticker_quote_date'.format(old_table))
+    cursor.execute('DROP INDEX quote_date_ratio')
+
+    # the partition key has to be part of every unique index, so the primary key becomes (id, date);
+    # ids still come from the original sequence
+    cursor.execute('CREATE TABLE {0} (LIKE {1} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   'PARTITION BY RANGE (date)'.format(table, old_table))
+    cursor.execute('ALTER TABLE {0} ADD PRIMARY KEY (id, date)'.format(table))
+    cursor.execute('ALTER TABLE {0} ADD CONSTRAINT unique_ticker_quote_date UNIQUE (ticker_id, date)'.format(table))
+    cursor.execute('CREATE INDEX quote_date_ratio ON {0} (date, sac_to_sacma_ratio)'.format(table))
+    cursor.execute('ALTER TABLE {0} ADD FOREIGN KEY (ticker_id) REFERENCES tickers_ticker (id) '
+                   'DEFERRABLE INITIALLY DEFERRED'.format(table))
+    cursor.execute('ALTER SEQUENCE {0}_id_seq OWNED BY {0}.id'.format(table))
+
+    year_partitions(cursor, table, years)
+    cursor.execute('CREATE TABLE {0}_default PARTITION OF {0} DEFAULT'.format(table))
+
+    cursor.execute('INSERT INTO {0} SELECT * FROM {1}'.format(table, old_table))
+    if not keep_old:
+        cursor.execute('DROP TABLE {0}'.format(old_table))
+
+
+class Command(BaseCommand):
+
+    help = 'Convert the quote table into yearly range partitions (PostgreSQL 11+), or add partitions for new years.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--first-year', type=int, default=None,
+                            help='Defaults to the year of the oldest quote.')
+        parser.add_argument('--years-ahead', type=int, default=1)
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Keep the unpartitioned table as <table>_unpartitioned.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL, not {0}.'.format(connection.vendor))
+        connection.ensure_connection()
+        if connection.pg_version < MINIMUM_SERVER_VERSION:
+            raise CommandError('PostgreSQL {0} has no declarative partitioning; 11 or later is needed.'.format(
+                connection.pg_version))
+
+        table = Quote._meta.db_table
+        oldest = Quote.objects.order_by('date').values_list('date', flat=True).first()
+        first_year = options['first_year'] or (oldest.year if oldest else datetime.today().year)
+        years = range(first_year, datetime.today().year + options['years_ahead'] + 1)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # rows outside every yearly partition land in <table>_default, which has to be
+            # empty for a year before that year's partition can be added
+            if is_partitioned(cursor, table):
+                year_partitions(cursor, table, years)
+                print('Added partitions of {0} for {1}-{2}'.format(table, years[0], years[-1]))
+            else:
+                partition_table(cursor, table, years, options['keep_old'])
+                print('Partitioned {0} by year, {1}-{2}'.format(table, years[0], years[-1]))
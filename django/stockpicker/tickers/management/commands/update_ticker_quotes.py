@@ -1,13 +1,76 @@
-from django.core.management import BaseCommand
+import time
+from functools import partial
+
+from django.core.management import BaseCommand, CommandError
 from django.conf import settings
+from django.utils.timezone import datetime, timedelta
 
 from tickers.models import Ticker
-from tickers.utility import update_ticker_data
+from tickers.metrics import latency_percentiles
+from tickers.parallel import run_in_processes
+from tickers.tasks import update_index, update_symbols, sweep_results
+from tickers.trading_days import latest_trading_day
+
+
+def progress_line(done, total, failed, started):
+    elapsed = time.time() - started
+    rate = done / elapsed if elapsed else 0
+    eta = timedelta(seconds=int((total - done) / rate)) if rate else '?'
+    return '{0}/{1} tickers ({2} failed), {3:.1f} tickers/s, elapsed {4}, ETA {5}'.format(
+        done, total, failed, rate, timedelta(seconds=int(elapsed)), eta)
 
 
 class Command(BaseCommand):
 
+    help = 'Update quotes for every ticker (or some of them) without Celery, optionally across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='+', default=None, help='Defaults to every ticker.')
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Only tickers without a quote for the latest trading day.')
+        parser.add_argument('--force', action='store_true', help='Download and recompute the full history.')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=settings.SWEEP_BATCH_SIZE,
+                            help='Tickers downloaded per provider request.')
+
     def handle(self, *args, **options):
-        update_ticker_data(settings.INDEX_TICKER)
-        for ticker in Ticker.objects.all():
-            update_ticker_data(ticker.symbol)
+        tickers = Ticker.objects.exclude(symbol=settings.INDEX_TICKER)
+        if options['symbols']:
+            tickers = tickers.filter(symbol__in=options['symbols'])
+            unknown = set(options['symbols']) - set(tickers.values_list('symbol', flat=True)) - {settings.INDEX_TICKER}
+            if unknown:
+                raise CommandError('Unknown tickers: {0}'.format(', '.join(sorted(unknown))))
+        if options['stale_only']:
+            tickers = tickers.stale(latest_trading_day(datetime.today().date()))
+        symbols = list(tickers.order_by('symbol').values_list('symbol', flat=True))
+
+        # the index once, before any ticker is scaled by it
+        update_index(force=options['force'])
+
+        batch_size = options['batch_size']
+        batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        print('Updating {0} tickers in {1} batches with {2} workers'.format(
+            len(symbols), len(batches), options['workers']))
+
+        summary = sweep_results()
+        started = time.time()
+        update = partial(update_symbols, force=options['force'])
+        for results in run_in_processes(update, batches, options['workers']):
+            for key in summary:
+                summary[key].extend(results[key])
+            done = len(summary['updated']) + len(summary['skipped']) + len(summary['failed'])
+            print(progress_line(done, len(symbols), len(summary['failed']), started))
+
+        print('Finished in {0}: {1} updated, {2} skipped, {3} failed'.format(
+            timedelta(seconds=int(time.time() - started)), len(summary['updated']), len(summary['skipped']),
+            len(summary['failed'])))
+        if summary['ticker_seconds']:
+            percentiles = latency_percentiles(summary['ticker_seconds'])
+            print('Per-ticker update time: p50 {0}s, p95 {1}s'.format(
+                percentiles['p50_seconds'], percentiles['p95_seconds']))
+        for symbol in summary['skipped']:
+            print('Skipped {0}: being updated by another task'.format(symbol))
+        for failure in summary['failed']:
+            print('Failed {0}: {1}'.format(failure['symbol'], failure['error']))
+        if summary['failed']:
+            raise CommandError('{0} of {1} tickers failed'.format(len(summary['failed']), len(symbols)))
@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from django.core.cache import cache
+
+from tickers.response_cache import cache_stats
+
+STAGES = ('db_read', 'download', 'compute', 'write')
+
+COUNTERS = ('tickers_updated', 'rows_fetched', 'rows_written', 'queries')
+
+# upper bounds (seconds) of the per-ticker update latency histogram
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float('inf'))
+
+# recorded by tickers.locks, per kind of lock
+LOCK_KINDS = ('ticker', 'index')
+LOCK_COUNTERS = ('acquired', 'contended', 'lost', 'fenced')
+
+METRICS_PREFIX = 'metrics:'
+
+
+class TickerTimings(object):
+
+    # spans and counters for one ticker update, collected in-process and then
+    # added to the shared totals in the cache by record_ticker_update()
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.counts['tickers_updated'] = 1
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+
+    def count(self, name, value=1):
+        self.counts[name] += value
+
+    def count_query(self, execute, sql, params, many, context):
+        # a connection.execute_wrapper
+        self.counts['queries'] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def describe(self):
+        return '{0}: {1:.3f}s ({2}), {3}'.format(
+            self.symbol, self.total_seconds,
+            ', '.join('{0} {1:.3f}s'.format(stage, self.seconds[stage]) for stage in STAGES),
+            ', '.join('{0} {1}'.format(name, self.counts[name]) for name in COUNTERS[1:]))
+
+
+def metric_key(*parts):
+    return METRICS_PREFIX + ':'.join(str(part) for part in parts)
+
+
+def increment(key, value):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        # evicted between add and incr
+        pass
+
+
+def record_ticker_update(timings):
+    # seconds are kept as integer microseconds so every total can use the cache's atomic incr
+    total_seconds = timings.total_seconds
+    for stage in STAGES:
+        increment(metric_key('stage_microseconds', stage), int(timings.seconds[stage] * 1e6))
+    for name in COUNTERS:
+        increment(metric_key(name), timings.counts[name])
+    increment(metric_key('ticker_microseconds_sum'), int(total_seconds * 1e6))
+    for bound in LATENCY_BUCKETS:
+        if total_seconds <= bound:
+            increment(metric_key('ticker_seconds_bucket', bound), 1)
+
+
+def latency_percentiles(seconds):
+    if not seconds:
+        return {'p50_seconds': None, 'p95_seconds': None}
+    p50, p95 = np.percentile(seconds, [50, 95])
+    return {'p50_seconds': round(float(p50), 3), 'p95_seconds': round(float(p95), 3)}
+
+
+def prometheus_metrics():
+    keys = [metric_key('stage_microseconds', stage) for stage in STAGES]
+    keys += [metric_key(name) for name in COUNTERS]
+    keys += [metric_key('ticker_microseconds_sum')]
+    keys += [metric_key('ticker_seconds_bucket', bound) for bound in LATENCY_BUCKETS]
+    keys += [metric_key('lock', name, kind) for name in LOCK_COUNTERS + ('wait_microseconds',) for kind in LOCK_KINDS]
+    values = cache.get_many(keys)
+
+    def value(*parts):
+        return values.get(metric_key(*parts), 0)
+
+    lines = [
+        '# HELP stockpicker_update_stage_seconds_total Seconds spent in each ticker update stage.',
+        '# TYPE stockpicker_update_stage_seconds_total counter',
+    ]
+    for stage in STAGES:
+        lines.append('stockpicker_update_stage_seconds_total{{stage="{0}"}} {1}'.format(
+            stage, value('stage_microseconds', stage) / 1e6))
+
+    for name in COUNTERS:
+        lines.append('# TYPE stockpicker_{0}_total counter'.format(name))
+        lines.append('stockpicker_{0}_total {1}'.format(name, value(name)))
+
+    # every update increments each bucket it falls under, so the stored buckets are already cumulative
+    lines.append('# HELP stockpicker_ticker_update_seconds Wall time of each ticker update.')
+    lines.append('# TYPE stockpicker_ticker_update_seconds histogram')
+    for bound in LATENCY_BUCKETS:
+        lines.append('stockpicker_ticker_update_seconds_bucket{{le="{0}"}} {1}'.format(
+            '+Inf' if bound == float('inf') else bound, value('ticker_seconds_bucket', bound)))
+    lines.append('stockpicker_ticker_update_seconds_sum {0}'.format(value('ticker_microseconds_sum') / 1e6))
+    lines.append('stockpicker_ticker_update_seconds_count {0}'.format(value('tickers_updated')))
+
+    # contended: gave up waiting; lost: the lease ran out mid-update; fenced: a write was refused for it
+    for name in LOCK_COUNTERS:
+        lines.append('# TYPE stockpicker_lock_{0}_total counter'.format(name))
+        for kind in LOCK_KINDS:
+            lines.append('stockpicker_lock_{0}_total{{kind="{1}"}} {2}'.format(name, kind, value('lock', name, kind)))
+    lines.append('# HELP stockpicker_lock_wait_seconds_total Seconds spent waiting to acquire locks.')
+    lines.append('# TYPE stockpicker_lock_wait_seconds_total counter')
+    for kind in LOCK_KINDS:
+        lines.append('stockpicker_lock_wait_seconds_total{{kind="{0}"}} {1}'.format(
+            kind, value('lock', 'wait_microseconds', kind) / 1e6))
+
+    lines.append('# TYPE stockpicker_response_cache_requests_total counter')
+    for result, count in sorted(cache_stats().items()):
+        lines.append('stockpicker_response_cache_requests_total{{result="{0}"}} {1}'.format(result, count))
+
+    return '\n'.join(lines) + '\n'
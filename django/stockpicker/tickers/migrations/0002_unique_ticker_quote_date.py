@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_quotes(apps, schema_editor):
+    Quote = apps.get_model('tickers', 'Quote')
+    duplicates = (Quote.objects.values('ticker_id', 'date')
+                  .annotate(quote_count=Count('id'), keep_id=Min('id'))
+                  .filter(quote_count__gt=1))
+    # keep the lowest id, which is the row the old MultipleObjectsReturned fallback kept updating
+    for duplicate in duplicates:
+        Quote.objects.filter(ticker_id=duplicate['ticker_id'],
+                             date=duplicate['date']).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_quotes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quote',
+            constraint=models.UniqueConstraint(fields=('ticker', 'date'), name='unique_ticker_quote_date'),
+        ),
+    ]
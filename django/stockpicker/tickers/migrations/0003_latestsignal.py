@@ -0,0 +1,55 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import tickers.models
+
+
+# the fields as of this migration; tickers.models.LATEST_SIGNAL_FIELDS may change later
+LATEST_SIGNAL_FIELDS = [
+    'date',
+    'adj_close',
+    'index_adj_close',
+    'scaled_adj_close',
+    'sac_moving_average',
+    'sac_to_sacma_ratio',
+]
+
+
+def create_latest_signals(apps, schema_editor):
+    Ticker = apps.get_model('tickers', 'Ticker')
+    LatestSignal = apps.get_model('tickers', 'LatestSignal')
+    for ticker in Ticker.objects.all():
+        quote = ticker.quote_set.order_by('-date').first()
+        if quote is not None:
+            LatestSignal.objects.create(ticker=ticker, **{
+                field: getattr(quote, field) for field in LATEST_SIGNAL_FIELDS})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0002_unique_ticker_quote_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestSignal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('adj_close', models.FloatField(default=0)),
+                ('index_adj_close', models.FloatField(default=0)),
+                ('scaled_adj_close', models.FloatField(default=0)),
+                ('sac_moving_average', models.FloatField(default=0)),
+                ('sac_to_sacma_ratio', models.FloatField(default=0)),
+                ('ticker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='tickers.Ticker')),
+            ],
+            bases=(tickers.models.SerializeQuoteMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='latestsignal',
+            index=models.Index(fields=['date', 'sac_to_sacma_ratio'], name='latest_signal_date_ratio'),
+        ),
+        migrations.RunPython(create_latest_signals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+def fill_latest_quote_dates(apps, schema_editor):
+    Ticker = apps.get_model('tickers', 'Ticker')
+    for ticker in Ticker.objects.annotate(latest=models.Max('quote__date')).filter(latest__isnull=False):
+        Ticker.objects.filter(pk=ticker.pk).update(cached_latest_quote_date=ticker.latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0003_latestsignal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticker',
+            name='cached_latest_quote_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_latest_quote_dates, migrations.RunPython.noop),
+    ]
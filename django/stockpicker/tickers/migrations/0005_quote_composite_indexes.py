@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0004_ticker_latest_quote_date'),
+    ]
+
+    # the new index is built before the single-column ones it replaces are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['date', 'sac_to_sacma_ratio'], name='quote_date_ratio'),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='ticker',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='tickers.Ticker'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0005_quote_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WindowSignal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('weeks', models.SmallIntegerField()),
+                ('sac_moving_average', models.FloatField(default=0)),
+                ('sac_to_sacma_ratio', models.FloatField(default=0)),
+                ('quotes_in_moving_average', models.IntegerField(default=0)),
+                ('ticker', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='tickers.Ticker')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='windowsignal',
+            index=models.Index(fields=['weeks', 'date', 'sac_to_sacma_ratio'], name='window_signal_date_ratio'),
+        ),
+        migrations.AddConstraint(
+            model_name='windowsignal',
+            constraint=models.UniqueConstraint(fields=('ticker', 'weeks', 'date'), name='unique_window_signal'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0006_windowsignal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticker',
+            name='fencing_token',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
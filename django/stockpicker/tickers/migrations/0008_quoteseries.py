@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0007_ticker_fencing_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuoteSeries',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quotes', models.IntegerField(default=0)),
+                ('latest_date', models.DateField(blank=True, null=True)),
+                ('data', models.BinaryField()),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ticker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='tickers.Ticker')),
+            ],
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:07
+
+from django.db import migrations
+import tickers.models
+
+# table -> the derived signal columns stored as real
+SIGNAL_COLUMNS = {
+    'tickers_quote': ['scaled_adj_close', 'sac_moving_average', 'sac_to_sacma_ratio'],
+    'tickers_windowsignal': ['sac_moving_average', 'sac_to_sacma_ratio'],
+}
+
+
+def alter_signal_columns(column_type):
+    # one ALTER TABLE per table, so the quote table and its indexes are rewritten once rather than
+    # once per column; SQLite keeps every REAL in 8 bytes, so there is nothing to change there
+    def alter(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for table, columns in SIGNAL_COLUMNS.items():
+            schema_editor.execute('ALTER TABLE {0} {1}'.format(table, ', '.join(
+                'ALTER COLUMN {0} TYPE {1}'.format(column, column_type) for column in columns)))
+    return alter
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickers', '0008_quoteseries'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(alter_signal_columns('real'), alter_signal_columns('double precision')),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='quote',
+                    name='sac_moving_average',
+                    field=tickers.models.Float32Field(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='quote',
+                    name='sac_to_sacma_ratio',
+                    field=tickers.models.Float32Field(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='quote',
+                    name='scaled_adj_close',
+                    field=tickers.models.Float32Field(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='windowsignal',
+                    name='sac_moving_average',
+                    field=tickers.models.Float32Field(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='windowsignal',
+                    name='sac_to_sacma_ratio',
+                    field=tickers.models.Float32Field(default=0),
+                ),
+            ],
+        ),
+    ]
@@ -3,26 +3,82 @@ from django.utils.timezone import now
 from django.conf import settings
 
 
+class TickerQuerySet(models.QuerySet):
+
+    def with_latest_quote_date(self):
+        # every ticker's latest quote date in one aggregate query
+        return self.annotate(latest_quote=models.Max('quote__date'))
+
+    def stale(self, as_of):
+        # tickers with no quotes, or none as recent as `as_of`
+        return self.with_latest_quote_date().filter(
+            models.Q(latest_quote__isnull=True) | models.Q(latest_quote__lt=as_of))
+
+
 class Ticker(models.Model):
     created = models.DateTimeField(default=now)
 
     symbol = models.CharField(max_length=10, db_index=True)
 
+    # maintained by the update pipeline; None means unknown and falls back to the quotes
+    cached_latest_quote_date = models.DateField(null=True, blank=True)
+
+    # the newest lock fencing token (see tickers.locks) whose holder wrote this ticker's quotes
+    fencing_token = models.BigIntegerField(default=0)
+
+    objects = TickerQuerySet.as_manager()
+
     def latest_quote_date(self):
-        if self.quote_set.count() > 0:
-            return self.quote_set.order_by('-date').first().date
-        return None
+        if self.cached_latest_quote_date is None:
+            latest = self.quote_set.aggregate(latest=models.Max('date'))['latest']
+            if latest is not None:
+                self.set_latest_quote_date(latest)
+        return self.cached_latest_quote_date
+
+    def set_latest_quote_date(self, latest):
+        # a single-column UPDATE, without the post_save receivers of a full save()
+        Ticker.objects.filter(pk=self.pk).update(cached_latest_quote_date=latest)
+        self.cached_latest_quote_date = latest
+
+    def claim_fencing_token(self, token):
+        # False once a newer lock holder has written; call inside the writing transaction
+        return bool(Ticker.objects.filter(pk=self.pk, fencing_token__lte=token).update(fencing_token=token))
 
     def __str__(self):
         return self.symbol
 
 
-class Quote(models.Model):
+class SerializeQuoteMixin(object):
+
+    def serialize(self):
+        return {
+            'symbol': self.ticker.symbol,
+            'date': self.date.strftime('%Y-%m-%d'),
+            'ac': round(self.adj_close, settings.DECIMAL_DIGITS),
+            'iac': round(self.index_adj_close, settings.DECIMAL_DIGITS),
+            'sac': round(self.scaled_adj_close, settings.DECIMAL_DIGITS),
+            'sac_ma': round(self.sac_moving_average, settings.DECIMAL_DIGITS),
+            'ratio': round(self.sac_to_sacma_ratio, settings.DECIMAL_DIGITS)
+        }
+
+
+class Float32Field(models.FloatField):
+
+    # a 4-byte real column where the database has one: for derived signals, which are served
+    # rounded to DECIMAL_DIGITS and do not need double precision. SQLite stores every REAL in 8 bytes.
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'real'
+        return super().db_type(connection)
+
+
+class Quote(SerializeQuoteMixin, models.Model):
     created = models.DateTimeField(default=now)
 
-    ticker = models.ForeignKey(Ticker, on_delete=models.PROTECT)
+    # both are served by the composite indexes below, so neither needs an index of its own
+    ticker = models.ForeignKey(Ticker, on_delete=models.PROTECT, db_index=False)
 
-    date = models.DateField(db_index=True)
+    date = models.DateField()
 
     high = models.FloatField(default=0)
     low = models.FloatField(default=0)
@@ -31,22 +87,127 @@ class Quote(models.Model):
     volume = models.FloatField(default=0)
     adj_close = models.FloatField(default=0)
 
+    # an index price, kept in double precision like adj_close for the re-adjustment check
+    index_adj_close = models.FloatField(default=0)
+    scaled_adj_close = Float32Field(default=0)
+    sac_moving_average = Float32Field(default=0)
+    sac_to_sacma_ratio = Float32Field(default=0)
+    quotes_in_moving_average = models.IntegerField(default=0)
+
+    class Meta:
+        # the unique (ticker, date) index serves every per-ticker lookup and date ordering
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date'], name='unique_ticker_quote_date'),
+        ]
+        # the cross-sectional scans: one date, ordered or filtered by the ratio
+        indexes = [
+            models.Index(fields=['date', 'sac_to_sacma_ratio'], name='quote_date_ratio'),
+        ]
+
+    def __str__(self):
+        return '{0}-{1}'.format(self.ticker.symbol, self.date)
+
+
+# each ticker's most recent quote for the recommendations page, maintained by the update pipeline
+# and, for single quotes saved or deleted elsewhere, by tickers.receivers
+class LatestSignal(SerializeQuoteMixin, models.Model):
+    ticker = models.OneToOneField(Ticker, on_delete=models.CASCADE)
+
+    date = models.DateField()
+
+    adj_close = models.FloatField(default=0)
     index_adj_close = models.FloatField(default=0)
     scaled_adj_close = models.FloatField(default=0)
     sac_moving_average = models.FloatField(default=0)
     sac_to_sacma_ratio = models.FloatField(default=0)
-    quotes_in_moving_average = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'sac_to_sacma_ratio'], name='latest_signal_date_ratio'),
+        ]
 
     def __str__(self):
         return '{0}-{1}'.format(self.ticker.symbol, self.date)
 
-    def serialize(self):
-        return {
-            'symbol': self.ticker.symbol,
-            'date': self.date.strftime('%Y-%m-%d'),
-            'ac': round(self.adj_close, settings.DECIMAL_DIGITS),
-            'iac': round(self.index_adj_close, settings.DECIMAL_DIGITS),
-            'sac': round(self.scaled_adj_close, settings.DECIMAL_DIGITS),
-            'sac_ma': round(self.sac_moving_average, settings.DECIMAL_DIGITS),
-            'ratio': round(self.sac_to_sacma_ratio, settings.DECIMAL_DIGITS)
-        }
+    @classmethod
+    def refresh(cls, ticker, quote=None):
+        if quote is None:
+            quote = ticker.quote_set.order_by('-date').first()
+        if quote is None:
+            cls.objects.filter(ticker=ticker).delete()
+            return None
+        signal, _ = cls.objects.update_or_create(ticker=ticker, defaults={
+            field: getattr(quote, field) for field in LATEST_SIGNAL_FIELDS})
+        return signal
+
+
+# a quote's signals for one of the moving-average windows besides MOVING_AVERAGE_WEEKS
+class WindowSignal(models.Model):
+    ticker = models.ForeignKey(Ticker, on_delete=models.CASCADE, db_index=False)
+
+    date = models.DateField()
+
+    weeks = models.SmallIntegerField()
+
+    sac_moving_average = Float32Field(default=0)
+    sac_to_sacma_ratio = Float32Field(default=0)
+    quotes_in_moving_average = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'weeks', 'date'], name='unique_window_signal'),
+        ]
+        indexes = [
+            models.Index(fields=['weeks', 'date', 'sac_to_sacma_ratio'], name='window_signal_date_ratio'),
+        ]
+
+    def __str__(self):
+        return '{0}-{1}-{2}w'.format(self.ticker.symbol, self.date, self.weeks)
+
+    @classmethod
+    def replace(cls, ticker, dates, windows, since=None):
+        # windows: {weeks: {field: numpy array}} for every date in `dates`; rows from `since` on are rewritten
+        dates = list(dates)
+        windows = {weeks: {field: values.tolist() for field, values in averages.items()}
+                   for weeks, averages in windows.items()}
+        first = 0
+        if since is not None:
+            first = next((i for i, date in enumerate(dates) if date >= since), len(dates))
+        signals = cls.objects.filter(ticker=ticker, weeks__in=list(windows))
+        if since is not None:
+            signals = signals.filter(date__gte=since)
+        signals.delete()
+        cls.objects.bulk_create([
+            cls(ticker=ticker, date=date, weeks=weeks,
+                sac_moving_average=averages['sac_moving_average'][i],
+                sac_to_sacma_ratio=averages['sac_to_sacma_ratio'][i],
+                quotes_in_moving_average=averages['quotes_in_moving_average'][i])
+            for weeks, averages in windows.items()
+            for i, date in enumerate(dates[first:], first)
+        ], batch_size=settings.QUOTE_WRITE_BATCH_SIZE)
+
+
+# a ticker's whole served series in one row, packed by tickers.series.pack_series(); only
+# maintained when QUOTE_SERIES_STORAGE is 'packed'
+class QuoteSeries(models.Model):
+    ticker = models.OneToOneField(Ticker, on_delete=models.CASCADE)
+
+    quotes = models.IntegerField(default=0)
+    latest_date = models.DateField(null=True, blank=True)
+
+    data = models.BinaryField()
+
+    updated = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return '{0}-series'.format(self.ticker.symbol)
+
+
+LATEST_SIGNAL_FIELDS = [
+    'date',
+    'adj_close',
+    'index_adj_close',
+    'scaled_adj_close',
+    'sac_moving_average',
+    'sac_to_sacma_ratio',
+]
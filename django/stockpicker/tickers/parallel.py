@@ -0,0 +1,27 @@
+import multiprocessing
+
+from django.db import connections
+
+from tickers.utility import reset_quote_providers
+
+
+def run_in_processes(func, items, workers):
+    # yields func(item) for every item as they finish, in whatever order they finish;
+    # func must be a module-level function so it can be sent to the workers
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # forked workers must not share the parent's database or quote provider sockets; with none
+    # open when the pool forks, every process opens its own on first use (and inherits the configured Django)
+    connections.close_all()
+    pool = multiprocessing.get_context('fork').Pool(min(workers, len(items)), initializer=reset_quote_providers)
+    try:
+        for result in pool.imap_unordered(func, items):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
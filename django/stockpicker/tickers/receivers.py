@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from tickers.models import Ticker, Quote, LatestSignal, QuoteSeries
+from tickers.response_cache import invalidate_ticker_responses
+
+
+# single-row edits (admin, shell); the bulk update pipeline invalidates explicitly
+@receiver(post_save, sender=Ticker)
+@receiver(post_delete, sender=Ticker)
+def ticker_changed(sender, instance, **kwargs):
+    invalidate_ticker_responses(instance.symbol)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def quote_changed(sender, instance, **kwargs):
+    # re-read from the quotes the next time it is needed
+    Ticker.objects.filter(pk=instance.ticker_id).update(cached_latest_quote_date=None)
+    QuoteSeries.objects.filter(ticker_id=instance.ticker_id).delete()
+    # the edited quote may be, or may have been, the ticker's latest
+    LatestSignal.refresh(instance.ticker)
+    invalidate_ticker_responses(instance.ticker.symbol)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+# the version of responses that depend on every ticker (the ticker list, recommendations)
+ALL_TICKERS = '*'
+
+HITS_KEY = 'response-cache-hits'
+MISSES_KEY = 'response-cache-misses'
+NOT_MODIFIED_KEY = 'response-cache-not-modified'
+
+
+def data_version_key(symbol):
+    return 'data-version:{0}'.format(symbol)
+
+
+def data_version(symbol=ALL_TICKERS):
+    key = data_version_key(symbol)
+    version = cache.get(key)
+    if version is None:
+        # random versions can never collide with responses cached before the key was lost
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_ticker_responses(symbol):
+    cache.set_many({data_version_key(symbol): uuid.uuid4().hex,
+                    data_version_key(ALL_TICKERS): uuid.uuid4().hex}, None)
+
+
+def count(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add and incr
+        pass
+
+
+def cache_stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY, NOT_MODIFIED_KEY])
+    return {
+        'hits': counts.get(HITS_KEY, 0),
+        'misses': counts.get(MISSES_KEY, 0),
+        'not_modified': counts.get(NOT_MODIFIED_KEY, 0),
+    }
+
+
+def request_symbol(request):
+    return request.query_params.get('ticker') or request.data.get('ticker')
+
+
+def cached_response(symbol_getter=None):
+    # caches a view method's 200 responses until the data they were built from changes,
+    # answering matching If-None-Match GETs with a 304
+    def decorator(method):
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            symbol = symbol_getter(request) if symbol_getter else ALL_TICKERS
+            parameters = json.dumps([view.__class__.__name__, symbol, data_version(symbol),
+                                     sorted(request.query_params.items())])
+            etag = '"{0}"'.format(hashlib.md5(parameters.encode('utf-8')).hexdigest())
+
+            if request.method in ('GET', 'HEAD') and etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+                count(NOT_MODIFIED_KEY)
+                response = Response(status=HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+            key = 'response:{0}'.format(etag.strip('"'))
+            data = cache.get(key)
+            if data is not None:
+                count(HITS_KEY)
+                response = Response(data, status=HTTP_200_OK)
+            else:
+                count(MISSES_KEY)
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.RESPONSE_CACHE_SECONDS)
+
+            response['ETag'] = etag
+            return response
+
+        return wrapper
+
+    return decorator
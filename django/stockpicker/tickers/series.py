@@ -0,0 +1,155 @@
+import base64
+
+import numpy as np
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from tickers.models import QuoteSeries
+
+# response key -> Quote field, in the order of Quote.serialize()
+SERIES_FIELDS = [
+    ('ac', 'adj_close'),
+    ('iac', 'index_adj_close'),
+    ('sac', 'scaled_adj_close'),
+    ('sac_ma', 'sac_moving_average'),
+    ('ratio', 'sac_to_sacma_ratio'),
+]
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+# QuoteSeries.data: each column contiguous, little-endian, 8-byte columns first so every
+# column starts aligned. Prices keep float64; the derived signal columns are served rounded
+# to DECIMAL_DIGITS and fit float32. Dates are int64 days since 1970-01-01, the layout of datetime64[D].
+PACKED_COLUMNS = [
+    ('ac', '<f8'),
+    ('iac', '<f8'),
+    ('date', '<i8'),
+    ('sac', '<f4'),
+    ('sac_ma', '<f4'),
+    ('ratio', '<f4'),
+]
+
+
+def in_date_range(queryset, start=None, end=None):
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def ticker_series(ticker, start=None, end=None, weeks=None):
+    # the ticker's quotes as parallel numpy arrays
+    series = None
+    if settings.QUOTE_SERIES_STORAGE == 'packed':
+        series = packed_series(ticker, start, end)
+    if series is None:
+        series = stored_series(ticker, start, end)
+    if weeks is not None and weeks != settings.MOVING_AVERAGE_WEEKS:
+        apply_window(series, ticker, weeks, start, end)
+    return series
+
+
+def stored_series(ticker, start=None, end=None):
+    # from the Quote rows, without instantiating any Quote
+    quotes = in_date_range(ticker.quote_set.order_by('date'), start, end)
+    rows = list(quotes.values_list('date', *[field for _, field in SERIES_FIELDS]))
+    series = {'date': np.array([row[0] for row in rows], dtype='datetime64[D]')}
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(SERIES_FIELDS))
+    for i, (key, _) in enumerate(SERIES_FIELDS):
+        series[key] = values[:, i]
+    return series
+
+
+def pack_series(series):
+    columns = dict(series, date=(series['date'] - EPOCH).astype(np.int64))
+    return b''.join(np.ascontiguousarray(columns[key], dtype=dtype).tobytes() for key, dtype in PACKED_COLUMNS)
+
+
+def unpack_series(data, quotes):
+    # read-only views into data (bytes, or the memoryview psycopg2 returns for bytea): nothing is copied
+    series = {}
+    offset = 0
+    for key, dtype in PACKED_COLUMNS:
+        series[key] = np.frombuffer(data, dtype=dtype, count=quotes, offset=offset)
+        offset += quotes * np.dtype(dtype).itemsize
+    series['date'] = series['date'].view('datetime64[D]')
+    return series
+
+
+def packed_series(ticker, start=None, end=None):
+    # None when the ticker has no QuoteSeries, or one behind its latest quote
+    packed = QuoteSeries.objects.filter(ticker=ticker).values_list('latest_date', 'quotes', 'data').first()
+    if packed is None or packed[0] != ticker.latest_quote_date():
+        return None
+    series = unpack_series(packed[2], packed[1])
+    first, last = 0, packed[1]
+    if start is not None:
+        first = np.searchsorted(series['date'], np.datetime64(start, 'D'))
+    if end is not None:
+        last = np.searchsorted(series['date'], np.datetime64(end, 'D'), side='right')
+    return {key: values[first:last] for key, values in series.items()}
+
+
+def refresh_quote_series(ticker):
+    # rebuilt from the stored quotes, inside the transaction that wrote them
+    series = stored_series(ticker)
+    latest_date = series['date'][-1].astype(object) if len(series['date']) else None
+    QuoteSeries.objects.update_or_create(ticker=ticker, defaults={
+        'quotes': len(series['date']),
+        'latest_date': latest_date,
+        'data': pack_series(series),
+        'updated': now(),
+    })
+
+
+def apply_window(series, ticker, weeks, start=None, end=None):
+    # swap in the moving average and ratio of another window from WindowSignal
+    signals = in_date_range(ticker.windowsignal_set.filter(weeks=weeks).order_by('date'), start, end)
+    rows = list(signals.values_list('date', 'sac_moving_average', 'sac_to_sacma_ratio'))
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    if not np.array_equal(dates, series['date']):
+        raise ValueError('The {0}-week window has not been computed for {1}'.format(weeks, ticker.symbol))
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), 2)
+    series['sac_ma'] = values[:, 0]
+    series['ratio'] = values[:, 1]
+
+
+def rows_payload(series, symbol):
+    # identical to serializing each Quote
+    dates = np.datetime_as_string(series['date']).tolist()
+    columns = [(key, series[key].tolist()) for key, _ in SERIES_FIELDS]
+    rows = []
+    for i, date in enumerate(dates):
+        row = {'symbol': symbol, 'date': date}
+        for key, values in columns:
+            row[key] = round(values[i], settings.DECIMAL_DIGITS)
+        rows.append(row)
+    return rows
+
+
+def columns_payload(series, symbol=None):
+    columns = {'date': np.datetime_as_string(series['date']).tolist()}
+    for key, _ in SERIES_FIELDS:
+        # float32 columns are widened first, so the rounded values print as short as float64 ones
+        columns[key] = np.round(np.asarray(series[key], dtype=np.float64), settings.DECIMAL_DIGITS).tolist()
+    return columns
+
+
+def packed_payload(series, symbol=None):
+    # little-endian int32 days since 1970-01-01 and float32 values, base64 encoded
+    def encode(values, dtype):
+        return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+    packed = {'date': encode((series['date'] - EPOCH).astype(np.int64), '<i4')}
+    for key, _ in SERIES_FIELDS:
+        packed[key] = encode(series[key], '<f4')
+    return packed
+
+
+def unpack_payload(packed):
+    series = {'date': EPOCH + np.frombuffer(base64.b64decode(packed['date']), dtype='<i4').astype('timedelta64[D]')}
+    for key, _ in SERIES_FIELDS:
+        series[key] = np.frombuffer(base64.b64decode(packed[key]), dtype='<f4')
+    return series
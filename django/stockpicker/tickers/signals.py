@@ -0,0 +1,99 @@
+import numpy as np
+
+from django.utils.timezone import timedelta
+from django.conf import settings
+
+
+def as_date_array(dates):
+    return np.asarray(dates, dtype='datetime64[D]')
+
+
+def window_bounds(dates, weeks):
+    # quotes in the window of dates[i] are dates[starts[i]:ends[i]],
+    # i.e. every quote dated within `weeks` weeks before dates[i], inclusive.
+    # dates must be sorted ascending.
+    starts = np.searchsorted(dates, dates - np.timedelta64(7 * weeks, 'D'), side='left')
+    ends = np.searchsorted(dates, dates, side='right')
+    return starts, ends
+
+
+def signal_windows():
+    # the configured windows besides MOVING_AVERAGE_WEEKS, whose signals live on Quote itself
+    return sorted(set(settings.SIGNAL_WINDOWS_WEEKS) - {settings.MOVING_AVERAGE_WEEKS})
+
+
+def window_sums(values, starts, ends):
+    # the sum of values[starts[i]:ends[i]] for every i, added left to right exactly like
+    # the legacy loop's sum(), so the averages match it bit for bit; one vectorized
+    # addition per position in the longest window, so O(quotes x window)
+    lengths = ends - starts
+    totals = np.zeros(len(values))
+    if not len(values):
+        return totals
+    for offset in range(int(lengths.max())):
+        active = lengths > offset
+        totals[active] += values[starts[active] + offset]
+    return totals
+
+
+def moving_averages(dates, scaled_adj_close, windows):
+    # MOVING_AVERAGE_WEEKS, the window stored on Quote, is summed exactly like the legacy loop;
+    # every other window is a difference of one cumulative sum, so it costs one more pass
+    cumulative = None
+    averages = {}
+    for weeks in windows:
+        starts, ends = window_bounds(dates, weeks)
+        quotes_in_moving_average = ends - starts
+        if weeks == settings.MOVING_AVERAGE_WEEKS:
+            totals = window_sums(scaled_adj_close, starts, ends)
+        else:
+            if cumulative is None:
+                cumulative = np.zeros(len(scaled_adj_close) + 1)
+                np.cumsum(scaled_adj_close, out=cumulative[1:])
+            totals = cumulative[ends] - cumulative[starts]
+        sac_moving_average = totals / quotes_in_moving_average
+        averages[weeks] = {
+            'sac_moving_average': sac_moving_average,
+            'quotes_in_moving_average': quotes_in_moving_average,
+            'sac_to_sacma_ratio': scaled_adj_close / sac_moving_average,
+        }
+    return averages
+
+
+def compute_signals(dates, adj_close, index_adj_close, weeks=None, windows=None):
+    # the Quote fields for `weeks`, plus {weeks: fields} under 'windows' for any other windows
+    if weeks is None:
+        weeks = settings.MOVING_AVERAGE_WEEKS
+
+    dates = as_date_array(dates)
+    adj_close = np.asarray(adj_close, dtype=np.float64)
+    index_adj_close = np.asarray(index_adj_close, dtype=np.float64)
+
+    scaled_adj_close = adj_close / index_adj_close
+
+    averages = moving_averages(dates, scaled_adj_close, [weeks] + list(windows or []))
+
+    signals = {
+        'index_adj_close': index_adj_close,
+        'scaled_adj_close': scaled_adj_close,
+    }
+    signals.update(averages.pop(weeks))
+    if windows is not None:
+        signals['windows'] = averages
+    return signals
+
+
+def legacy_moving_average(dates, scaled_adj_close, weeks=None):
+    # the original per-quote loop, kept as the reference for tests and benchmarks
+    if weeks is None:
+        weeks = settings.MOVING_AVERAGE_WEEKS
+
+    quotes = list(zip(dates, scaled_adj_close))
+    sac_moving_average = []
+    quotes_in_moving_average = []
+    for date, _ in quotes:
+        moving_average_start = date + timedelta(weeks=-weeks)
+        moving_average_quote_values = [v for d, v in quotes if moving_average_start <= d <= date]
+        quotes_in_moving_average.append(len(moving_average_quote_values))
+        sac_moving_average.append(sum(moving_average_quote_values) / len(moving_average_quote_values))
+    return sac_moving_average, quotes_in_moving_average
@@ -1,9 +1,27 @@
+import gc
+import time
+
+from celery import chain, chord
+from celery.signals import task_postrun, worker_init
+
 from django.conf import settings
 from django.core.cache import cache
+from django.utils.timezone import datetime
 
 from stockpicker.celery import app
-from tickers.models import Ticker
-from tickers.utility import update_ticker_data
+from tickers.models import Ticker, Quote
+from tickers.locks import LockLost, index_lock, ticker_lock
+from tickers.metrics import latency_percentiles
+from tickers.trading_days import latest_trading_day
+from tickers.utility import update_ticker_data, prefetch_quotes
+
+LAST_SWEEP_KEY = 'last-ticker-sweep'
+
+# how long concurrent adds of one symbol share a job
+ADD_TICKER_JOB_SECONDS = 10 * 60
+
+# how long an issued job's status can be looked up, the default Celery result expiry
+ADD_TICKER_STATUS_SECONDS = 24 * 60 * 60
 
 
 @app.task()
@@ -20,30 +38,209 @@ def update_all_tickers():
 @app.task()
 def update_ticker(ticker_symbol):
 
-    # cache.add returns False if the key already exists
-    if not cache.add(ticker_symbol, 'true', 5 * 60):
-        print('{0} has already been accepted by another task.'.format(ticker_symbol))
-        return
+    update_index()
+    if ticker_symbol == settings.INDEX_TICKER:
+        return ticker_symbol
 
-    update_ticker_data(ticker_symbol)
+    with ticker_lock(ticker_symbol) as lock:
+        if not lock.held:
+            print('{0} has already been accepted by another task.'.format(ticker_symbol))
+            return
 
-    cache.delete(ticker_symbol)
+        try:
+            update_ticker_data(ticker_symbol, update_index=False, lock=lock)
+        except LockLost as e:
+            print(e)
+            return
 
     return ticker_symbol
 
 
-@app.task()
-def chained_ticker_updates(ticker_id=0):
+def update_index(force=False):
 
-    if Ticker.objects.filter(id=ticker_id).exists():
-        ticker = Ticker.objects.get(id=ticker_id)
-        if not cache.add(ticker.symbol, 'true', 5 * 60):
-            print('{0} has already been accepted by another task.'.format(ticker.symbol))
+    # waits for a refresh already in progress rather than skipping it, since every ticker needs the index
+    with index_lock() as lock:
+        if not lock.held:
+            print('Gave up waiting for the {0} refresh.'.format(settings.INDEX_TICKER))
             return
-        update_ticker_data(ticker.symbol)
-        cache.delete(ticker.symbol)
 
-    for tid in list(Ticker.objects.order_by('id').values_list('id', flat=True)):
-        if tid > ticker_id and Ticker.objects.filter(id=tid).exists():
-            chained_ticker_updates.delay(tid)
-            break
+        try:
+            update_ticker_data(settings.INDEX_TICKER, force=force, update_index=False, lock=lock)
+        except LockLost as e:
+            print(e)
+
+
+def add_ticker_job_key(ticker_symbol):
+    return 'add-ticker-job:{0}'.format(ticker_symbol)
+
+
+def add_ticker_status_key(job_id):
+    # set when AddTickerView issues the job; Celery reports unknown ids as PENDING forever
+    return 'add-ticker-status:{0}'.format(job_id)
+
+
+def add_ticker_busy(ticker_symbol):
+    return {'ticker': ticker_symbol, 'success': False,
+            'error': '"{0}" is being updated by another task, please try again later'.format(ticker_symbol)}
+
+
+@app.task(bind=True)
+def add_ticker(self, ticker_symbol):
+
+    def progress(stage):
+        self.update_state(state='PROGRESS', meta={'ticker': ticker_symbol, 'stage': stage})
+
+    try:
+        update_index()
+        # a sweep may be updating the symbol already; the add still wants the full history afterwards
+        with ticker_lock(ticker_symbol, wait_seconds=settings.LOCK_WAIT_SECONDS) as lock:
+            if not lock.held:
+                return add_ticker_busy(ticker_symbol)
+            try:
+                update_ticker_data(ticker_symbol, force=True, update_index=False, progress=progress, lock=lock)
+            except LockLost as e:
+                print(e)
+                return add_ticker_busy(ticker_symbol)
+    finally:
+        # later adds of the same symbol start a new job
+        cache.delete(add_ticker_job_key(ticker_symbol))
+
+    if not Quote.objects.filter(ticker__symbol=ticker_symbol).exists():
+        return {'ticker': ticker_symbol, 'success': False,
+                'error': 'No data found for "{0}"'.format(ticker_symbol)}
+    return {'ticker': ticker_symbol, 'success': True}
+
+
+@app.task()
+def sweep_tickers(batch_size=None, concurrency=None):
+
+    batch_size = batch_size or settings.SWEEP_BATCH_SIZE
+    concurrency = concurrency or settings.SWEEP_CONCURRENCY
+
+    started = time.time()
+
+    # refresh the index once, every batch below reuses it
+    update_index()
+
+    # one aggregate query picks the tickers that are behind the latest trading day
+    as_of = latest_trading_day(datetime.today().date())
+    symbols = list(Ticker.objects.stale(as_of).exclude(symbol=settings.INDEX_TICKER)
+                   .order_by('symbol').values_list('symbol', flat=True))
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+    # each lane runs its batches one after another, so at most `concurrency` batches
+    # (and requests to the quote provider) are in flight at once
+    lanes = [batches[i::concurrency] for i in range(concurrency) if batches[i::concurrency]]
+
+    if not lanes:
+        return sweep_complete([], started)
+
+    header = [chain(update_ticker_batch.s(sweep_results(), lane[0]),
+                    *[update_ticker_batch.s(batch) for batch in lane[1:]]) for lane in lanes]
+
+    print('Sweeping {0} tickers in {1} batches over {2} lanes'.format(len(symbols), len(batches), len(lanes)))
+
+    chord(header)(sweep_complete.s(started).on_error(sweep_failed.s()))
+
+
+def sweep_results():
+    # ticker_seconds holds the wall time of every ticker that was actually updated
+    return {'updated': [], 'skipped': [], 'failed': [], 'ticker_seconds': []}
+
+
+@app.task()
+def update_ticker_batch(results, symbols):
+
+    # chained batches receive the lane's results so far
+    return update_symbols(symbols, results)
+
+
+def update_symbols(symbols, results=None, force=False):
+
+    # shared by the sweep and the update_ticker_quotes command; the index must already be up to date
+    if results is None:
+        results = sweep_results()
+
+    # one provider request for the whole batch; if it fails, each ticker downloads its own quotes
+    try:
+        prefetched = prefetch_quotes(symbols, force=force)
+    except Exception as e:
+        print('Error downloading the batch {0}: {1!r}'.format(', '.join(symbols), e))
+        prefetched = None
+
+    for symbol in symbols:
+
+        lock = ticker_lock(symbol)
+        if not lock.acquire():
+            print('{0} has already been accepted by another task.'.format(symbol))
+            results['skipped'].append(symbol)
+            continue
+
+        try:
+            timings = update_ticker_data(symbol, force=force, update_index=False, prefetched=prefetched, lock=lock)
+            results['updated'].append(symbol)
+            if timings is not None:
+                results['ticker_seconds'].append(round(timings.total_seconds, 3))
+        except LockLost as e:
+            # the worker that took the ticker over finishes it
+            print(e)
+            results['skipped'].append(symbol)
+        except Exception as e:
+            print('Error updating {0}: {1!r}'.format(symbol, e))
+            results['failed'].append({'symbol': symbol, 'error': repr(e)})
+        finally:
+            lock.release()
+            # workers are reused between tasks, so the batch's frames are let go as soon as each is done
+            if prefetched is not None:
+                prefetched[1].pop(symbol, None)
+
+    return results
+
+
+@app.task()
+def sweep_complete(lane_results, started):
+
+    summary = sweep_results()
+    for results in lane_results:
+        for key in summary:
+            summary[key].extend(results[key])
+    summary['seconds'] = round(time.time() - started, 3)
+    summary.update(latency_percentiles(summary['ticker_seconds']))
+
+    cache.set(LAST_SWEEP_KEY, summary, None)
+
+    print('Sweep finished in {0}s: {1} updated, {2} skipped, {3} failed'.format(
+        summary['seconds'], len(summary['updated']), len(summary['skipped']), len(summary['failed'])))
+
+    if summary['ticker_seconds']:
+        print('Per-ticker update time: p50 {0}s, p95 {1}s'.format(summary['p50_seconds'], summary['p95_seconds']))
+
+    return summary
+
+
+@app.task()
+def sweep_failed(request, exc, traceback):
+
+    # a lane raised, so sweep_complete never runs; record that the last sweep failed
+    summary = sweep_results()
+    summary['error'] = repr(exc)
+    cache.set(LAST_SWEEP_KEY, summary, None)
+
+    print('Sweep failed: {0!r}'.format(exc))
+
+
+@task_postrun.connect
+def release_memory(**kwargs):
+
+    # worker children now run many tasks; collect the reference cycles pandas objects leave behind
+    # so memory is handed back before CELERY_WORKER_MAX_MEMORY_PER_CHILD has to recycle the child
+    gc.collect()
+
+
+@worker_init.connect
+def preload_data_libraries(**kwargs):
+
+    # the web tier never imports pandas; a worker's tasks all need it, so the main worker process
+    # imports it once and the prefork children share those pages instead of importing it themselves
+    import pandas  # noqa: F401
+    import pandas_datareader.data  # noqa: F401
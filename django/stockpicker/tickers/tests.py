@@ -1,12 +1,43 @@
+import gzip
 import json
+import math
+import os
 import random
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-from django.utils.timezone import datetime
-from django.test import TestCase
+import numpy as np
+import pandas as pd
+import requests
+
+from django.utils.timezone import datetime, timedelta
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.cache import cache
 from django.urls import reverse
+from django.core.management import call_command, CommandError
 from django.conf import settings
 
-from tickers.models import Ticker, Quote
+from stockpicker.celery import app
+
+from tickers.models import Ticker, Quote, LatestSignal, WindowSignal, QuoteSeries
+from tickers import utility
+from tickers.utility import (merge_quotes, write_quotes, update_ticker_data, get_quote_provider,
+                             split_symbol_frames, LocalFileQuoteProvider, YahooQuoteProvider)
+from tickers.signals import compute_signals, legacy_moving_average, signal_windows
+from tickers.tasks import add_ticker, sweep_tickers, sweep_failed, update_symbols, LAST_SWEEP_KEY
+from tickers.series import unpack_payload, pack_series, unpack_series
+from tickers.downsampling import lttb_indices, minmax_indices
+from tickers.response_cache import invalidate_ticker_responses
+from tickers.index_cache import get_index_series, index_adj_close_for, invalidate_index_series
+from tickers.metrics import TickerTimings, prometheus_metrics
+from tickers.locks import LeaseLock, LockLost, ticker_lock, index_lock
+from tickers.parallel import run_in_processes
+from tickers.benchmarks import (SyntheticQuoteProvider, benchmark_pipeline, benchmark_endpoints, measure_startup,
+                                STARTUP_TARGETS, startup_regressions)
+from tickers.trading_days import (TradingDays, is_trading_day, latest_trading_day, previous_trading_day,
+                                  missing_trading_days)
 
 
 def fake_quote_serialize(quote):
@@ -21,6 +52,103 @@ def fake_quote_serialize(quote):
     }
 
 
+class ComputeSignalsTests(TestCase):
+
+    def setUp(self):
+        start = datetime(2014, 1, 1).date()
+        self.dates = sorted(start + timedelta(days=random.randint(0, 5 * 365)) for _ in range(800))
+        self.adj_close = [random.uniform(1, 100) for _ in self.dates]
+        self.index_adj_close = [random.uniform(100, 300) for _ in self.dates]
+
+    def test_matches_legacy_loop(self):
+        signals = compute_signals(self.dates, self.adj_close, self.index_adj_close)
+        scaled_adj_close = [a / i for a, i in zip(self.adj_close, self.index_adj_close)]
+        legacy_average, legacy_counts = legacy_moving_average(self.dates, scaled_adj_close)
+        self.assertEqual(signals['scaled_adj_close'].tolist(), scaled_adj_close)
+        # random dates include duplicates, which the legacy loop counts in every window they fall in
+        self.assertEqual(signals['quotes_in_moving_average'].tolist(), legacy_counts)
+        self.assertEqual(signals['sac_moving_average'].tolist(), legacy_average)
+        self.assertEqual(signals['sac_to_sacma_ratio'].tolist(),
+                         [sac / expected for sac, expected in zip(scaled_adj_close, legacy_average)])
+
+    def test_no_quotes(self):
+        signals = compute_signals([], [], [])
+        self.assertEqual(signals['sac_moving_average'].tolist(), [])
+
+    def test_other_windows_match_legacy_loop_to_rounding(self):
+        # only MOVING_AVERAGE_WEEKS needs bit-for-bit parity; the others come from a cumulative sum
+        signals = compute_signals(self.dates, self.adj_close, self.index_adj_close, windows=[20, 200])
+        for weeks, averages in signals['windows'].items():
+            legacy_average, legacy_counts = legacy_moving_average(self.dates, signals['scaled_adj_close'].tolist(), weeks)
+            self.assertEqual(averages['quotes_in_moving_average'].tolist(), legacy_counts)
+            for value, expected in zip(averages['sac_moving_average'].tolist(), legacy_average):
+                self.assertAlmostEqual(value, expected, places=12)
+
+    def test_windows_match_single_window(self):
+        signals = compute_signals(self.dates, self.adj_close, self.index_adj_close, windows=[20, 200])
+        self.assertEqual(sorted(signals['windows']), [20, 200])
+        for weeks, averages in signals['windows'].items():
+            expected = compute_signals(self.dates, self.adj_close, self.index_adj_close, weeks=weeks)
+            for field, values in averages.items():
+                self.assertEqual(values.tolist(), expected[field].tolist())
+
+
+class IndexSeriesCacheTests(TestCase):
+
+    def setUp(self):
+        invalidate_index_series()
+        self.index = Ticker.objects.create(symbol=settings.INDEX_TICKER)
+        self.today = datetime.today().date()
+        Quote.objects.create(ticker=self.index, date=self.today, adj_close=250)
+
+    def test_series_is_reused_until_invalidated(self):
+        series = get_index_series()
+        self.assertIs(get_index_series(), series)
+        Quote.objects.filter(ticker=self.index).update(adj_close=125)
+        self.assertIs(get_index_series(), series)
+        invalidate_index_series()
+        self.assertEqual(get_index_series()[1].tolist(), [125])
+
+    def test_new_index_quote_changes_version(self):
+        series = get_index_series()
+        Quote.objects.create(ticker=self.index, date=self.today + timedelta(days=1), adj_close=260)
+        self.assertIsNot(get_index_series(), series)
+        self.assertEqual(index_adj_close_for([self.today + timedelta(days=1)]).tolist(), [260])
+
+    def test_missing_index_date(self):
+        with self.assertRaises(KeyError):
+            index_adj_close_for([self.today + timedelta(days=1)])
+
+
+class TradingDaysTests(TestCase):
+
+    def test_holidays_and_weekends(self):
+        self.assertTrue(is_trading_day(datetime(2024, 3, 28).date()))
+        # Good Friday, a Saturday, Juneteenth observed on a Monday
+        for day in [datetime(2024, 3, 29), datetime(2024, 3, 30), datetime(2022, 6, 20)]:
+            self.assertFalse(is_trading_day(day.date()))
+        # Juneteenth only closes the market from 2022
+        self.assertTrue(is_trading_day(datetime(2021, 6, 18).date()))
+        # no Friday closure when New Year's Day is a Saturday
+        self.assertTrue(is_trading_day(datetime(2021, 12, 31).date()))
+
+    def test_previous_and_latest_trading_day(self):
+        # Easter Monday looks back over the weekend and Good Friday
+        self.assertEqual(previous_trading_day(datetime(2024, 4, 1).date()), datetime(2024, 3, 28).date())
+        self.assertEqual(latest_trading_day(datetime(2024, 4, 1).date()), datetime(2024, 4, 1).date())
+        # Christmas 2022 fell on a Sunday, so the market closed on Monday the 26th
+        self.assertEqual(latest_trading_day(datetime(2022, 12, 26).date()), datetime(2022, 12, 23).date())
+        self.assertEqual(missing_trading_days(datetime(2022, 12, 22).date(), datetime(2022, 12, 28).date(),
+                                              {datetime(2022, 12, 23).date()}),
+                         [datetime(2022, 12, 27).date(), datetime(2022, 12, 28).date()])
+
+    def test_range(self):
+        calendar = TradingDays(datetime(2020, 1, 1).date(), datetime(2020, 12, 31).date())
+        self.assertEqual(calendar.count_between(datetime(2020, 1, 1).date(), datetime(2020, 12, 31).date()), 253)
+        with self.assertRaises(ValueError):
+            calendar.is_trading_day(datetime(2021, 1, 4).date())
+
+
 class TickerModelTests(TestCase):
 
     def setUp(self):
@@ -29,6 +157,28 @@ class TickerModelTests(TestCase):
     def test_ticker_exists(self):
         self.assertTrue(Ticker.objects.get(symbol='TEST').id > 0)
 
+    def test_latest_quote_date(self):
+        ticker = Ticker.objects.get(symbol='TEST')
+        self.assertIsNone(ticker.latest_quote_date())
+        for day in [1, 3, 2]:
+            Quote.objects.create(ticker=ticker, date=datetime(2020, 1, day).date())
+        # the first read fills the cached date, later reads use it without touching the quotes
+        self.assertEqual(Ticker.objects.get(symbol='TEST').latest_quote_date(), datetime(2020, 1, 3).date())
+        ticker = Ticker.objects.get(symbol='TEST')
+        with self.assertNumQueries(0):
+            self.assertEqual(ticker.latest_quote_date(), datetime(2020, 1, 3).date())
+
+    def test_stale_tickers(self):
+        fresh = Ticker.objects.create(symbol='FRESH')
+        for symbol, day in [('TEST', 2), ('FRESH', 3)]:
+            Quote.objects.create(ticker=Ticker.objects.get(symbol=symbol), date=datetime(2020, 1, day).date())
+        Ticker.objects.create(symbol='EMPTY')
+        with self.assertNumQueries(1):
+            stale = sorted(Ticker.objects.stale(datetime(2020, 1, 3).date()).values_list('symbol', flat=True))
+        self.assertEqual(stale, ['EMPTY', 'TEST'])
+        self.assertEqual(Ticker.objects.with_latest_quote_date().get(pk=fresh.pk).latest_quote,
+                         datetime(2020, 1, 3).date())
+
 
 class QuoteModelTests(TestCase):
 
@@ -39,6 +189,11 @@ class QuoteModelTests(TestCase):
         ticker = Ticker.objects.get(symbol='TEST')
         self.assertTrue(Quote.objects.get(ticker=ticker, date=datetime.today()).id > 0)
 
+    def test_signal_columns_are_single_precision(self):
+        postgresql = mock.Mock(vendor='postgresql')
+        self.assertEqual(Quote._meta.get_field('sac_to_sacma_ratio').db_type(postgresql), 'real')
+        self.assertEqual(WindowSignal._meta.get_field('sac_moving_average').db_type(postgresql), 'real')
+
     def test_quote_serializes(self):
         ticker = Ticker.objects.get(symbol='TEST')
         quote = Quote.objects.get(ticker=ticker, date=datetime.today())
@@ -47,7 +202,411 @@ class QuoteModelTests(TestCase):
             json.dumps(fake_quote_serialize(quote)))
 
 
-class TickersLoadedViewTests(TestCase):
+def fake_quote_data(adj_close):
+    return {'High': adj_close, 'Low': adj_close, 'Open': adj_close, 'Close': adj_close,
+            'Volume': 1000, 'Adj Close': adj_close}
+
+
+class WriteQuotesTests(TestCase):
+
+    def test_inserts_new_and_updates_stored_quotes(self):
+        ticker = Ticker.objects.create(symbol='TEST')
+        today = datetime.today().date()
+        stored = Quote.objects.create(ticker=ticker, date=today, adj_close=1)
+        quotes = merge_quotes(ticker, {today: fake_quote_data(2), today + timedelta(days=1): fake_quote_data(3)})
+        self.assertEqual([q.date for q in quotes], [today, today + timedelta(days=1)])
+        write_quotes(quotes)
+        self.assertEqual(ticker.quote_set.count(), 2)
+        self.assertEqual(Quote.objects.get(pk=stored.pk).adj_close, 2)
+        self.assertEqual(ticker.quote_set.get(date=today + timedelta(days=1)).adj_close, 3)
+
+
+def fake_adj_close(ticker_symbol, day):
+    # deterministic daily history, so overlapping downloads agree on every date
+    return 100 + 10 * math.sin(day.toordinal() / 30.0 + len(ticker_symbol))
+
+
+def fake_download(cutoff, adjust=1.0):
+    def download(ticker_symbol, start, end, prefetched=None):
+        day = start.date()
+        quotes = {}
+        while day <= min(end.date(), cutoff):
+            if day.weekday() < 5:
+                quotes[day] = fake_quote_data(fake_adj_close(ticker_symbol, day) * adjust)
+            day += timedelta(days=1)
+        return quotes
+    return download
+
+
+class IncrementalUpdateTests(TestCase):
+
+    def update(self, cutoff, force=False, adjust=1.0):
+        with mock.patch('tickers.utility.download_quotes', side_effect=fake_download(cutoff, adjust)) as download:
+            update_ticker_data('TEST', force=force)
+        return download
+
+    def derived_values(self):
+        return list(Ticker.objects.get(symbol='TEST').quote_set.order_by('date').values_list(
+            'date', 'scaled_adj_close', 'sac_moving_average', 'quotes_in_moving_average'))
+
+    def window_values(self):
+        return list(WindowSignal.objects.filter(ticker__symbol='TEST').order_by('weeks', 'date').values_list(
+            'weeks', 'date', 'sac_moving_average', 'quotes_in_moving_average'))
+
+    def test_incremental_matches_full_rebuild(self):
+        today = datetime.today().date()
+        self.update(today - timedelta(days=14))
+        download = self.update(today)
+        # only the tail was downloaded for the ticker
+        self.assertGreater(download.call_args[0][1].date(), today - timedelta(days=30))
+        incremental = self.derived_values()
+        ticker = Ticker.objects.get(symbol='TEST')
+        self.assertEqual(ticker.cached_latest_quote_date, incremental[-1][0])
+        incremental_windows = self.window_values()
+        self.assertEqual(len(incremental_windows), len(incremental) * len(signal_windows()))
+        self.update(today, force=True)
+        for row, expected in zip(incremental, self.derived_values()):
+            self.assertEqual(row[0], expected[0])
+            self.assertEqual(row[3], expected[3])
+            self.assertAlmostEqual(row[2], expected[2], places=12)
+        for row, expected in zip(incremental_windows, self.window_values()):
+            self.assertEqual(row[:2], expected[:2])
+            self.assertEqual(row[3], expected[3])
+            self.assertAlmostEqual(row[2], expected[2], places=12)
+
+    def test_adjustment_triggers_full_rebuild(self):
+        today = datetime.today().date()
+        self.update(today - timedelta(days=14))
+        download = self.update(today, adjust=0.5)
+        # the index and the ticker were both re-adjusted: each tail download is followed by a full one
+        self.assertEqual(download.call_count, 4)
+        first_quote = Ticker.objects.get(symbol='TEST').quote_set.order_by('date').first()
+        self.assertAlmostEqual(first_quote.adj_close, fake_adj_close('TEST', first_quote.date) * 0.5)
+
+
+@override_settings(SWEEP_BATCH_SIZE=2, SWEEP_CONCURRENCY=2)
+class SweepTickersTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        app.conf.task_always_eager = True
+        for symbol in [settings.INDEX_TICKER, 'AAA', 'BBB', 'CCC', 'DDD', 'EEE']:
+            Ticker.objects.create(symbol=symbol)
+
+    def tearDown(self):
+        app.conf.task_always_eager = False
+
+    def test_sweep_updates_every_ticker_and_records_failures(self):
+        def update(symbol, force=False, update_index=True, prefetched=None, lock=None):
+            if symbol == 'CCC':
+                raise ValueError('no data')
+
+        with mock.patch('tickers.tasks.update_ticker_data', side_effect=update) as update_ticker_data, \
+                mock.patch('tickers.tasks.prefetch_quotes') as prefetch_quotes:
+            sweep_tickers()
+
+        # one download per batch
+        self.assertEqual(prefetch_quotes.call_count, 3)
+        # the index is refreshed once, by the sweep itself
+        self.assertEqual([c[0][0] for c in update_ticker_data.call_args_list].count(settings.INDEX_TICKER), 1)
+        summary = cache.get(LAST_SWEEP_KEY)
+        self.assertEqual(sorted(summary['updated']), ['AAA', 'BBB', 'DDD', 'EEE'])
+        self.assertEqual([f['symbol'] for f in summary['failed']], ['CCC'])
+
+    def test_failed_batch_download_falls_back_to_each_ticker(self):
+        def prefetch(symbols, force=False):
+            if 'CCC' in symbols:
+                raise requests.ConnectionError('connection reset')
+            return None, {}
+
+        with mock.patch('tickers.tasks.update_ticker_data', return_value=None) as update_ticker_data, \
+                mock.patch('tickers.tasks.prefetch_quotes', side_effect=prefetch):
+            sweep_tickers()
+
+        summary = cache.get(LAST_SWEEP_KEY)
+        self.assertEqual(sorted(summary['updated']), ['AAA', 'BBB', 'CCC', 'DDD', 'EEE'])
+        prefetched = {c[0][0]: c[1].get('prefetched') for c in update_ticker_data.call_args_list}
+        self.assertIsNone(prefetched['CCC'])
+        self.assertIsNone(prefetched['DDD'])
+        self.assertIsNotNone(prefetched['AAA'])
+
+    def test_failed_lane_is_recorded(self):
+        # eager chords do not call their error callbacks, so the callback is checked and run by hand
+        with mock.patch('tickers.tasks.update_ticker_data'), mock.patch('tickers.tasks.chord') as sweep_chord:
+            sweep_tickers()
+        body = sweep_chord.return_value.call_args[0][0]
+        self.assertEqual([errback['task'] for errback in body.options['link_error']], [sweep_failed.name])
+
+        sweep_failed(None, RuntimeError('worker lost'), None)
+        self.assertIn('worker lost', cache.get(LAST_SWEEP_KEY)['error'])
+
+    def test_sweep_reports_per_ticker_latency(self):
+        def update(symbol, force=False, update_index=True, prefetched=None, lock=None):
+            timings = TickerTimings(symbol)
+            timings.started -= {'AAA': 1, 'BBB': 2}.get(symbol, 3)
+            return timings
+
+        with mock.patch('tickers.tasks.update_ticker_data', side_effect=update), \
+                mock.patch('tickers.tasks.prefetch_quotes'):
+            sweep_tickers()
+
+        summary = cache.get(LAST_SWEEP_KEY)
+        self.assertEqual(len(summary['ticker_seconds']), 5)
+        self.assertAlmostEqual(summary['p50_seconds'], 3, places=1)
+        self.assertAlmostEqual(summary['p95_seconds'], 3, places=1)
+
+
+class LockTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.ticker = Ticker.objects.create(symbol='TEST')
+
+    def test_contention_and_release(self):
+        with ticker_lock('TEST') as first:
+            self.assertTrue(first.held)
+            second = ticker_lock('TEST')
+            self.assertFalse(second.acquire())
+            second.release()
+            # releasing without holding leaves the holder's lease alone
+            self.assertEqual(cache.get(first.key), first.token)
+        self.assertIsNone(cache.get(first.key))
+        self.assertNotEqual(ticker_lock(settings.INDEX_TICKER).key, first.key)
+        self.assertEqual(ticker_lock(settings.INDEX_TICKER).key, index_lock().key)
+        self.assertIn('stockpicker_lock_contended_total{kind="ticker"} 1', prometheus_metrics())
+
+    @override_settings(LOCK_POLL_SECONDS=0.05)
+    def test_lease_is_renewed(self):
+        with LeaseLock('ticker:TEST', 'ticker', lease_seconds=1) as lock:
+            time.sleep(1.5)
+            self.assertTrue(lock.renew())
+            self.assertFalse(ticker_lock('TEST', wait_seconds=0.2).acquire())
+
+    def test_fencing_token(self):
+        stale = ticker_lock('TEST')
+        stale.acquire()
+        # the lease ran out and another worker took the ticker over and wrote
+        cache.delete(stale.key)
+        with ticker_lock('TEST') as current:
+            self.assertGreater(current.token, stale.token)
+            token = current.token
+            current.check(self.ticker)
+            self.assertFalse(stale.renew())
+            with self.assertRaises(LockLost):
+                stale.check(self.ticker)
+        stale.release()
+        self.assertEqual(Ticker.objects.get(pk=self.ticker.pk).fencing_token, token)
+
+    def test_waiter_after_another_writer(self):
+        holder = ticker_lock('TEST')
+        holder.acquire()
+
+        def other_worker_writes(seconds):
+            # between two polls the holder lets go and another worker takes the ticker and writes
+            holder.release()
+            with ticker_lock('TEST') as other:
+                other.check(self.ticker)
+
+        waiter = ticker_lock('TEST', wait_seconds=5)
+        with mock.patch('tickers.locks.time.sleep', side_effect=other_worker_writes):
+            self.assertTrue(waiter.acquire())
+        token = waiter.token
+        waiter.check(self.ticker)
+        waiter.release()
+        self.assertEqual(Ticker.objects.get(pk=self.ticker.pk).fencing_token, token)
+
+    @override_settings(LOCK_WAIT_SECONDS=0)
+    def test_add_ticker_reports_busy(self):
+        with mock.patch('tickers.tasks.update_index'), ticker_lock('TEST'):
+            result = add_ticker.apply(args=['TEST']).get()
+        self.assertFalse(result['success'])
+        self.assertIn('being updated by another task', result['error'])
+
+        def taken_over(*args, **kwargs):
+            raise LockLost('taken over')
+
+        with mock.patch('tickers.tasks.update_index'), \
+                mock.patch('tickers.tasks.update_ticker_data', side_effect=taken_over):
+            result = add_ticker.apply(args=['TEST']).get()
+        self.assertIn('being updated by another task', result['error'])
+
+    def test_locked_tickers_are_skipped(self):
+        with mock.patch('tickers.tasks.update_ticker_data') as update_ticker_data, \
+                mock.patch('tickers.tasks.prefetch_quotes'), ticker_lock('TEST'):
+            results = update_symbols(['TEST', 'OTHER'])
+        self.assertEqual(results['skipped'], ['TEST'])
+        self.assertEqual([c[0][0] for c in update_ticker_data.call_args_list], ['OTHER'])
+
+
+@override_settings(QUOTE_PROVIDER='tickers.benchmarks.SyntheticQuoteProvider', WEEKS_TO_DOWNLOAD=20)
+class UpdateTickerQuotesCommandTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for symbol in ['AAA', 'BBB']:
+            Ticker.objects.create(symbol=symbol)
+
+    def test_stale_only(self):
+        call_command('update_ticker_quotes', '--stale-only', '--batch-size', '1')
+        latest = LatestSignal.objects.get(ticker__symbol=settings.INDEX_TICKER).date
+        self.assertEqual(sorted(LatestSignal.objects.filter(date=latest).values_list('ticker__symbol', flat=True)),
+                         ['AAA', 'BBB', settings.INDEX_TICKER])
+
+        with mock.patch('tickers.tasks.update_ticker_data') as update_ticker_data:
+            call_command('update_ticker_quotes', '--stale-only')
+        # only the index is looked at again
+        self.assertEqual([c[0][0] for c in update_ticker_data.call_args_list], [settings.INDEX_TICKER])
+
+    def test_unknown_symbol(self):
+        with self.assertRaises(CommandError):
+            call_command('update_ticker_quotes', '--symbols', 'AAA', 'NOPE')
+
+    def test_forced_update_uses_the_batch_download(self):
+        call_command('update_ticker_quotes')
+        with mock.patch.object(SyntheticQuoteProvider, 'fetch', autospec=True,
+                               side_effect=SyntheticQuoteProvider.fetch) as fetch:
+            call_command('update_ticker_quotes', '--force')
+        # the index, then one download for the AAA, BBB batch that both tickers use
+        self.assertEqual([c[0][1] for c in fetch.call_args_list], [[settings.INDEX_TICKER], ['AAA', 'BBB']])
+
+
+def write_quote_csv(path, symbol, dates, extra_columns=None):
+    with open(path, 'w') as f:
+        f.write('Date,{0}High,Low,Open,Close,Volume,Adj Close\n'.format('Symbol,' if extra_columns else ''))
+        for day in dates:
+            adj_close = fake_adj_close(symbol, day)
+            f.write('{0},{1}{2},{2},{2},{2},1000,{2}\n'.format(
+                day.strftime('%Y-%m-%d'), symbol + ',' if extra_columns else '', adj_close))
+
+
+class QuoteProviderTests(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        today = datetime.today().date()
+        self.dates = [today - timedelta(days=d) for d in range(400, -1, -1) if (today - timedelta(days=d)).weekday() < 5]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_local_files_update_offline(self):
+        for symbol in [settings.INDEX_TICKER, 'TEST']:
+            write_quote_csv(os.path.join(self.path, symbol + '.csv'), symbol, self.dates)
+        with self.settings(QUOTE_PROVIDER='tickers.utility.LocalFileQuoteProvider', QUOTE_FILES_PATH=self.path):
+            self.assertIsInstance(get_quote_provider(), LocalFileQuoteProvider)
+            update_ticker_data('TEST')
+        quotes = Ticker.objects.get(symbol='TEST').quote_set.order_by('date')
+        self.assertEqual(list(quotes.values_list('date', flat=True)), self.dates)
+        self.assertAlmostEqual(quotes.last().adj_close, fake_adj_close('TEST', self.dates[-1]))
+
+    def test_yahoo_session_is_reused(self):
+        provider = YahooQuoteProvider()
+        with mock.patch('pandas_datareader.data.get_data_yahoo', return_value=pd.DataFrame(),
+                        create=True) as get_data_yahoo:
+            provider.fetch(['TEST'], datetime(2020, 1, 1), datetime(2020, 2, 1))
+            provider.fetch(['TEST'], datetime(2020, 1, 1), datetime(2020, 2, 1))
+        self.assertIs(get_data_yahoo.call_args_list[0][1]['session'], provider.session)
+        self.assertIs(get_data_yahoo.call_args_list[1][1]['session'], provider.session)
+
+    def test_update_records_timings(self):
+        for symbol in [settings.INDEX_TICKER, 'TEST']:
+            write_quote_csv(os.path.join(self.path, symbol + '.csv'), symbol, self.dates)
+        with self.settings(QUOTE_PROVIDER='tickers.utility.LocalFileQuoteProvider', QUOTE_FILES_PATH=self.path):
+            cache.clear()
+            timings = update_ticker_data('TEST')
+            # nothing to do the second time
+            self.assertIsNone(update_ticker_data('TEST'))
+
+        self.assertEqual(timings.counts['rows_fetched'], len(self.dates))
+        self.assertEqual(timings.counts['rows_written'], len(self.dates))
+        self.assertGreater(timings.counts['queries'], 0)
+        self.assertGreater(timings.seconds['compute'], 0)
+
+        metrics = self.client.get(reverse('metrics'))
+        self.assertEqual(metrics.status_code, 200)
+        body = metrics.content.decode('utf-8')
+        # the index and TEST
+        self.assertIn('stockpicker_tickers_updated_total 2\n', body)
+        self.assertIn('stockpicker_rows_written_total {0}\n'.format(2 * len(self.dates)), body)
+        self.assertIn('stockpicker_ticker_update_seconds_bucket{le="+Inf"} 2\n', body)
+
+    def test_combined_file(self):
+        path = os.path.join(self.path, 'combined.csv')
+        write_quote_csv(path, 'TEST', self.dates, extra_columns=True)
+        frames = LocalFileQuoteProvider(path).fetch(['TEST', 'NOPE'], datetime.now() - timedelta(days=7), datetime.now())
+        self.assertEqual(list(frames), ['TEST'])
+        self.assertTrue(0 < len(frames['TEST']) <= 5)
+
+    def test_import_matches_update(self):
+        for symbol in [settings.INDEX_TICKER, 'TEST']:
+            write_quote_csv(os.path.join(self.path, symbol + '.csv'), symbol, self.dates)
+        call_command('import_quotes', self.path, workers=1)
+
+        def derived_values():
+            return list(Quote.objects.filter(ticker__symbol='TEST').order_by('date').values_list(
+                'date', 'adj_close', 'sac_moving_average', 'quotes_in_moving_average', 'sac_to_sacma_ratio'))
+
+        imported = derived_values()
+        self.assertEqual(len(imported), len(self.dates))
+        self.assertEqual(LatestSignal.objects.get(ticker__symbol='TEST').date, self.dates[-1])
+        self.assertEqual(Ticker.objects.get(symbol='TEST').cached_latest_quote_date, self.dates[-1])
+
+        with self.settings(QUOTE_PROVIDER='tickers.utility.LocalFileQuoteProvider', QUOTE_FILES_PATH=self.path):
+            update_ticker_data('TEST', force=True)
+        for row, expected in zip(imported, derived_values()):
+            self.assertEqual(row[:2], expected[:2])
+            self.assertEqual(row[3], expected[3])
+            self.assertAlmostEqual(row[2], expected[2], places=12)
+            self.assertAlmostEqual(row[4], expected[4], places=12)
+
+    def test_import_without_recompute_clears_stale_data(self):
+        for symbol in [settings.INDEX_TICKER, 'TEST']:
+            write_quote_csv(os.path.join(self.path, symbol + '.csv'), symbol, self.dates[:-5])
+        with self.settings(QUOTE_SERIES_STORAGE='packed'):
+            call_command('import_quotes', self.path, workers=1)
+        self.assertTrue(QuoteSeries.objects.filter(ticker__symbol='TEST').exists())
+
+        write_quote_csv(os.path.join(self.path, 'TEST.csv'), 'TEST', self.dates)
+        call_command('import_quotes', self.path, '--symbols', 'TEST', '--skip-recompute', workers=1)
+        ticker = Ticker.objects.get(symbol='TEST')
+        self.assertEqual(ticker.latest_quote_date(), self.dates[-1])
+        self.assertEqual(LatestSignal.objects.get(ticker=ticker).date, self.dates[-1])
+        self.assertFalse(QuoteSeries.objects.filter(ticker=ticker).exists())
+
+    def test_split_multi_symbol_download(self):
+        index = pd.to_datetime(self.dates[-3:])
+        columns = pd.MultiIndex.from_product([['Adj Close', 'Close'], ['AAA', 'BBB']])
+        data = pd.DataFrame([[1.0, None, 1.0, None], [2.0, 20.0, 2.0, 20.0], [3.0, 30.0, 3.0, 30.0]],
+                            index=index, columns=columns)
+        frames = split_symbol_frames(data)
+        self.assertEqual(frames['AAA']['Adj Close'].tolist(), [1.0, 2.0, 3.0])
+        # BBB did not trade on the first date
+        self.assertEqual(frames['BBB']['Close'].tolist(), [20.0, 30.0])
+
+
+# run_in_processes() closes the connections before forking, which a TestCase transaction cannot survive
+class ParallelTests(SimpleTestCase):
+
+    def test_run_in_processes(self):
+        self.assertEqual(sorted(run_in_processes(abs, [-3, -1, 2], workers=2)), [1, 2, 3])
+
+    def test_workers_build_their_own_provider(self):
+        get_quote_provider()
+        self.assertEqual(list(run_in_processes(has_inherited_provider, [1, 2], workers=2)), [False, False])
+
+
+def has_inherited_provider(item):
+    return bool(utility._quote_providers)
+
+
+class ViewTestCase(TestCase):
+
+    def setUp(self):
+        # cached responses outlive the rolled-back rows of earlier tests
+        cache.clear()
+
+
+class TickersLoadedViewTests(ViewTestCase):
 
     def test_no_tickers(self):
         response = self.client.get(reverse('tickers_loaded'))
@@ -65,7 +624,7 @@ class TickersLoadedViewTests(TestCase):
             json.dumps({'tickers': ["TEST"]}))
 
 
-class SearchTickerDataViewTests(TestCase):
+class SearchTickerDataViewTests(ViewTestCase):
 
     def test_no_ticker(self):
         response = self.client.post(reverse('search_ticker_data'),
@@ -113,7 +672,364 @@ class SearchTickerDataViewTests(TestCase):
                         'avg_weeks': 86, 'results': [fake_quote_serialize(quote)]}))
 
 
-class GetRecommendationsViewTests(TestCase):
+class ResponseCacheTests(ViewTestCase):
+
+    def get_ticker_data(self, **headers):
+        return self.client.get(reverse('search_ticker_data'), {'ticker': 'TEST'}, **headers)
+
+    def test_etag_not_modified(self):
+        Ticker.objects.create(symbol='TEST')
+        response = self.get_ticker_data()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        response = self.get_ticker_data(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_until_quotes_change(self):
+        ticker = Ticker.objects.create(symbol='TEST')
+        etag = self.get_ticker_data()['ETag']
+        hits = self.client.get(reverse('response_cache_stats')).data['hits']
+        self.assertEqual(self.get_ticker_data()['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('response_cache_stats')).data['hits'], hits + 1)
+        write_quotes(merge_quotes(ticker, {datetime.today().date(): fake_quote_data(1)}))
+        invalidate_ticker_responses('TEST')
+        response = self.get_ticker_data(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.get_ticker_data().status_code, 412)
+        Ticker.objects.create(symbol='TEST')
+        self.assertEqual(self.get_ticker_data().status_code, 200)
+
+
+class TickerDataLayoutTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ticker = Ticker.objects.create(symbol='TEST')
+        today = datetime.today().date()
+        self.quotes = [Quote.objects.create(ticker=ticker, date=today - timedelta(days=d), adj_close=random.uniform(0, 10),
+                                            sac_to_sacma_ratio=random.uniform(0, 2)) for d in (2, 1, 0)]
+
+    def get_ticker_data(self, layout):
+        return self.client.get(reverse('search_ticker_data'), {'ticker': 'TEST', 'layout': layout})
+
+    def test_columns_match_rows(self):
+        rows = self.get_ticker_data('rows').data['results']
+        columns = self.get_ticker_data('columns').data['results']
+        for key in rows[0]:
+            if key != 'symbol':
+                self.assertEqual(columns[key], [row[key] for row in rows])
+
+    def test_packed_float32(self):
+        series = unpack_payload(self.get_ticker_data('packed').data['results'])
+        self.assertEqual(series['date'].tolist(), [q.date for q in self.quotes])
+        for value, quote in zip(series['ac'].tolist(), self.quotes):
+            self.assertAlmostEqual(value, quote.adj_close, places=5)
+
+    def test_unknown_layout(self):
+        self.assertEqual(self.get_ticker_data('nope').status_code, 412)
+
+    def test_date_range(self):
+        response = self.client.get(reverse('search_ticker_data'), {
+            'ticker': 'TEST', 'layout': 'columns',
+            'start': self.quotes[1].date.strftime('%Y-%m-%d'), 'end': self.quotes[1].date.strftime('%Y-%m-%d')})
+        self.assertEqual(response.data['results']['date'], [self.quotes[1].date.strftime('%Y-%m-%d')])
+        response = self.client.get(reverse('search_ticker_data'), {'ticker': 'TEST', 'start': 'yesterday'})
+        self.assertEqual(response.status_code, 412)
+
+
+class SignalWindowTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = datetime.today().date()
+        Quote.objects.create(ticker=Ticker.objects.create(symbol=settings.INDEX_TICKER), date=today,
+                             scaled_adj_close=1)
+        self.quotes = []
+        for symbol, ratio in (('BUY', 0.5), ('SELL', 1.5)):
+            ticker = Ticker.objects.create(symbol=symbol)
+            self.quotes += [Quote.objects.create(ticker=ticker, date=today - timedelta(days=d),
+                                                 adj_close=10 + d, scaled_adj_close=1 + d, sac_to_sacma_ratio=ratio)
+                            for d in (1, 0)]
+        # the 20-week window sees the opposite signals
+        for quote in self.quotes:
+            WindowSignal.objects.create(ticker=quote.ticker, date=quote.date, weeks=20, sac_moving_average=2,
+                                        sac_to_sacma_ratio=2 - quote.sac_to_sacma_ratio)
+
+    def test_ticker_data_window(self):
+        response = self.client.get(reverse('search_ticker_data'), {'ticker': 'BUY', 'layout': 'columns', 'window': 20})
+        self.assertEqual(response.data['avg_weeks'], 20)
+        self.assertEqual(response.data['results']['ratio'], [1.5, 1.5])
+        self.assertEqual(response.data['results']['sac_ma'], [2, 2])
+        response = self.client.get(reverse('search_ticker_data'), {'ticker': 'BUY', 'window': 7})
+        self.assertEqual(response.status_code, 412)
+        # configured, but never computed for this ticker
+        response = self.client.get(reverse('search_ticker_data'), {'ticker': 'BUY', 'window': 200})
+        self.assertEqual(response.status_code, 412)
+
+    def test_recommendations_window(self):
+        response = self.client.get(reverse('get_recommendations'), {'window': 20})
+        self.assertEqual(response.data['avg_weeks'], 20)
+        self.assertEqual([hit['symbol'] for hit in response.data['sell_hits']], ['BUY'])
+        self.assertEqual([hit['symbol'] for hit in response.data['buy_hits']], ['SELL'])
+        self.assertEqual(response.data['sell_hits'][0]['ratio'], 1.5)
+        self.assertEqual(response.data['sell_hits'][0]['sac'], 1)
+        response = self.client.get(reverse('get_recommendations'), {'window': 'x'})
+        self.assertEqual(response.status_code, 412)
+
+    def test_compute_command(self):
+        WindowSignal.objects.filter(ticker__symbol='SELL').delete()
+        call_command('compute_signal_windows', '--missing', '--weeks', '20', '--workers', '1')
+        signals = WindowSignal.objects.filter(ticker__symbol='SELL', weeks=20).order_by('date')
+        self.assertEqual([signal.quotes_in_moving_average for signal in signals], [1, 2])
+        self.assertEqual([signal.sac_moving_average for signal in signals], [2, 1.5])
+        # BUY already had its rows
+        self.assertEqual(WindowSignal.objects.get(ticker__symbol='BUY', date=self.quotes[1].date).sac_moving_average, 2)
+        with self.assertRaises(CommandError):
+            call_command('compute_signal_windows', '--weeks', '7')
+
+
+@override_settings(QUOTE_SERIES_STORAGE='packed')
+class PackedSeriesTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch('tickers.utility.download_quotes', side_effect=fake_download(datetime.today().date())):
+            update_ticker_data('TEST')
+
+    def get_ticker_data(self, **params):
+        cache.clear()
+        return self.client.get(reverse('search_ticker_data'), dict(params, ticker='TEST', layout='columns'))
+
+    def test_pack_round_trip_without_copies(self):
+        series = {'date': np.array(['2020-01-02', '2020-01-03'], dtype='datetime64[D]'),
+                  'ac': np.array([1.5, 2.5]), 'iac': np.array([3.0, 4.0]),
+                  'sac': np.array([0.5, 0.625]), 'sac_ma': np.array([0.5, 0.5625]), 'ratio': np.array([1, 1.1111])}
+        data = pack_series(series)
+        self.assertEqual(len(data), 2 * (3 * 8 + 3 * 4))
+        unpacked = unpack_series(data, 2)
+        for key, values in series.items():
+            self.assertTrue(np.allclose(unpacked[key].astype(np.float64), values.astype(np.float64)))
+        self.assertIs(unpacked['ac'].base, unpacked['ratio'].base)
+        self.assertEqual(unpacked['sac'].dtype, np.float32)
+
+    def test_matches_quote_rows(self):
+        packed = self.get_ticker_data().data['results']
+        self.assertEqual(QuoteSeries.objects.get(ticker__symbol='TEST').quotes, len(packed['date']))
+        with self.settings(QUOTE_SERIES_STORAGE='rows'):
+            rows = self.get_ticker_data().data['results']
+        # dates and the float64 ac and iac columns are served exactly as from the quote rows
+        for key in ('date', 'ac', 'iac'):
+            self.assertEqual(packed[key], rows[key])
+        # sac, sac_ma and ratio are stored as float32 (about 7 significant digits), so they are
+        # served as the stored values rounded to float32 and then to DECIMAL_DIGITS. That differs
+        # from the rows layout only for values within a float32 step of a rounding midpoint, and
+        # then by one unit in the last served digit.
+        stored = Quote.objects.filter(ticker__symbol='TEST').order_by('date').values_list(
+            'scaled_adj_close', 'sac_moving_average', 'sac_to_sacma_ratio')
+        last_digit = 10 ** -settings.DECIMAL_DIGITS
+        for key, values in zip(('sac', 'sac_ma', 'ratio'), zip(*stored)):
+            float32_values = np.asarray(values, dtype=np.float32).astype(np.float64)
+            self.assertEqual(packed[key], np.round(float32_values, settings.DECIMAL_DIGITS).tolist())
+            for value, expected in zip(packed[key], rows[key]):
+                self.assertLessEqual(abs(value - expected), last_digit * (1 + 1e-9))
+
+        start = packed['date'][10]
+        ranged = self.get_ticker_data(start=start, end=packed['date'][19]).data['results']
+        self.assertEqual(ranged['date'], packed['date'][10:20])
+
+    def test_edited_quote_falls_back_to_rows(self):
+        quote = Quote.objects.filter(ticker__symbol='TEST').latest('date')
+        quote.adj_close = 1234.5
+        quote.save()
+        self.assertFalse(QuoteSeries.objects.filter(ticker__symbol='TEST').exists())
+        self.assertEqual(self.get_ticker_data().data['results']['ac'][-1], 1234.5)
+        call_command('pack_quote_series', '--missing', '--workers', '1')
+        self.assertEqual(QuoteSeries.objects.count(), 2)
+        self.assertEqual(self.get_ticker_data().data['results']['ac'][-1], 1234.5)
+
+
+class CrossSectionTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.days = [datetime(2020, 3, day).date() for day in (2, 3, 4, 5, 6)]
+        ratios = {
+            settings.INDEX_TICKER: [1, 1, 1, 1, 1],
+            'AAA': [0.8, 0.9, 1.1, 1.2, 1.3],
+            'BBB': [1.2, 1.1, 1.05, 0.95, 0.9],
+            'CCC': [0.5, 0.6, None, 0.7, 0.8],
+            'DDD': [1.5, 0.5, 1.5, 1.6, None],
+        }
+        for symbol, values in ratios.items():
+            ticker = Ticker.objects.create(symbol=symbol)
+            for day, ratio in zip(self.days, values):
+                if ratio is not None:
+                    Quote.objects.create(ticker=ticker, date=day, sac_to_sacma_ratio=ratio)
+
+    def get_cross_section(self, **params):
+        return self.client.get(reverse('cross_section'), params)
+
+    def test_latest_date(self):
+        # the latest date, then every ratio and the symbols in one query each
+        with self.assertNumQueries(3):
+            response = self.get_cross_section(count=2, tickers='DDD,CCC')
+        self.assertEqual(response.data['date'], '2020-03-06')
+        self.assertEqual(response.data['tickers'], 3)
+        self.assertEqual(response.data['above_one'], 1)
+        self.assertEqual([hit['symbol'] for hit in response.data['highest']], ['AAA', 'BBB'])
+        self.assertEqual(response.data['lowest'][0], {'symbol': 'CCC', 'ratio': 0.8, 'percentile': 0.0,
+                                                      'days_since_cross': None})
+        # AAA crossed above 1 on the 4th, BBB below it on the 5th
+        self.assertEqual(response.data['highest'][0]['days_since_cross'], 2)
+        self.assertEqual(response.data['highest'][1]['days_since_cross'], 1)
+        self.assertEqual(response.data['highest'][0]['percentile'], 100)
+        self.assertIsNone(response.data['selected'][0]['ratio'])
+
+    def test_any_date_from_the_cached_matrix(self):
+        self.get_cross_section()
+        # only the version check: the matrix is reused for any date
+        with self.assertNumQueries(1):
+            response = self.get_cross_section(date='2020-03-05', history=1)
+        self.assertEqual([hit['symbol'] for hit in response.data['highest']], ['DDD', 'AAA', 'BBB', 'CCC'])
+        # DDD dipped below 1 on the 3rd only; the missing day of CCC does not break its run
+        self.assertEqual(response.data['highest'][0]['days_since_cross'], 1)
+        self.assertIsNone(response.data['highest'][3]['days_since_cross'])
+        self.assertEqual(response.data['history']['above_one'], [2, 1, 3, 2])
+        # a weekend resolves to the Friday before it
+        self.assertEqual(self.get_cross_section(date='2020-03-08').data['date'], '2020-03-06')
+
+    def test_new_quotes_rebuild_the_matrix(self):
+        self.get_cross_section()
+        quote = Quote.objects.create(ticker=Ticker.objects.get(symbol='DDD'), date=self.days[-1], sac_to_sacma_ratio=2)
+        invalidate_ticker_responses(quote.ticker.symbol)
+        response = self.get_cross_section()
+        self.assertEqual(response.data['highest'][0]['symbol'], 'DDD')
+
+    def test_errors(self):
+        self.assertEqual(self.get_cross_section(date='2020-03-01').status_code, 412)
+        self.assertEqual(self.get_cross_section(count=0).status_code, 412)
+        self.assertEqual(self.get_cross_section(tickers='NOPE').status_code, 412)
+
+
+class QuoteExportTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for symbol in ['AAA', 'BBB']:
+            ticker = Ticker.objects.create(symbol=symbol)
+            for day in range(1, 4):
+                Quote.objects.create(ticker=ticker, date=datetime(2020, 1, day).date(), adj_close=day)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_quotes'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        lines = self.export(tickers='BBB', start='2020-01-02').decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['symbol', 'date', 'open'])
+        self.assertEqual([line.split(',')[:2] for line in lines[1:]], [['BBB', '2020-01-02'], ['BBB', '2020-01-03']])
+
+    def test_ndjson_gzip(self):
+        rows = [json.loads(line) for line in gzip.decompress(self.export(output='ndjson', gzip='1')).splitlines()]
+        self.assertEqual([(row['symbol'], row['adj_close']) for row in rows],
+                         [('AAA', 1), ('AAA', 2), ('AAA', 3), ('BBB', 1), ('BBB', 2), ('BBB', 3)])
+
+    def test_unknown_ticker_and_output(self):
+        for params in [{'tickers': 'AAA,NOPE'}, {'output': 'xml'}]:
+            self.assertEqual(self.client.get(reverse('export_quotes'), params).status_code, 412)
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'quotes.csv.gz')
+        call_command('export_quotes', '--end', '2020-01-02', tickers=['AAA'], gzip=True, file=path)
+        with gzip.open(path, 'rt') as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+        shutil.rmtree(os.path.dirname(path))
+
+
+class DownsamplingTests(TestCase):
+
+    def setUp(self):
+        self.x = np.arange(1000)
+        self.y = np.sin(self.x / 50.0) + np.random.RandomState(0).normal(0, 0.1, 1000)
+        self.y[500] = 10
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        indices = lttb_indices(self.x, self.y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(500, indices)
+
+    def test_minmax_keeps_extremes(self):
+        indices = minmax_indices(self.y, 100)
+        self.assertLessEqual(len(indices), 100)
+        self.assertIn(int(np.argmax(self.y)), indices)
+        self.assertIn(int(np.argmin(self.y)), indices)
+
+    def test_short_series_is_untouched(self):
+        self.assertEqual(lttb_indices(self.x[:10], self.y[:10], 100).tolist(), list(range(10)))
+
+    def test_endpoint_points(self):
+        ticker = Ticker.objects.create(symbol='TEST')
+        today = datetime.today().date()
+        for d in range(50):
+            Quote.objects.create(ticker=ticker, date=today - timedelta(days=d), scaled_adj_close=random.uniform(0, 1))
+        cache.clear()
+        response = self.client.get(reverse('search_ticker_data'), {'ticker': 'TEST', 'points': 10})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['total_quotes'], 50)
+
+
+class AddTickerViewTests(ViewTestCase):
+
+    def add(self, symbol):
+        return self.client.post(reverse('add_ticker'), content_type="application/json",
+                                data=json.dumps({'ticker': symbol}))
+
+    def test_concurrent_adds_share_a_job(self):
+        with mock.patch('tickers.views.add_ticker.apply_async') as apply_async:
+            first = self.add('TEST')
+            second = self.add('TEST')
+            other = self.add('OTHER')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.data['job_id'], second.data['job_id'])
+        self.assertNotEqual(first.data['job_id'], other.data['job_id'])
+        self.assertEqual(apply_async.call_count, 2)
+
+    def test_job_releases_symbol(self):
+        app.conf.task_always_eager = True
+        try:
+            with mock.patch('tickers.tasks.update_ticker_data') as update_ticker_data:
+                first = self.add('TEST')
+                second = self.add('TEST')
+        finally:
+            app.conf.task_always_eager = False
+        self.assertEqual([c[0][0] for c in update_ticker_data.call_args_list].count('TEST'), 2)
+        self.assertNotEqual(first.data['job_id'], second.data['job_id'])
+
+    def test_job_status(self):
+        with mock.patch('tickers.views.add_ticker.apply_async'):
+            job_id = self.add('TEST').data['job_id']
+        with mock.patch('tickers.views.AsyncResult') as async_result:
+            async_result.return_value.state = 'PROGRESS'
+            async_result.return_value.ready.return_value = False
+            async_result.return_value.info = {'ticker': 'TEST', 'stage': 'downloading'}
+            response = self.client.get(reverse('job_status', args=[job_id]))
+        self.assertEqual(response.data, {'success': True, 'job_id': job_id, 'state': 'PROGRESS', 'ready': False,
+                                         'ticker': 'TEST', 'stage': 'downloading'})
+
+    def test_unknown_job(self):
+        # Celery would report it as PENDING forever
+        response = self.client.get(reverse('job_status', args=['abc']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.data['success'])
+
+
+class GetRecommendationsViewTests(ViewTestCase):
 
     def test_index_ticker_does_not_exist(self):
         response = self.client.get(reverse('get_recommendations'))
@@ -163,3 +1079,58 @@ class GetRecommendationsViewTests(TestCase):
                         'latest_data_date': quote.date.strftime('%Y-%m-%d'),
                         'sell_hits': [fake_quote_serialize(quote)],
                         'buy_hits': []}))
+
+    def test_hits_are_top_25_closest_to_one(self):
+        Quote.objects.create(ticker=Ticker.objects.create(symbol=settings.INDEX_TICKER), date=datetime.today())
+        for i in range(60):
+            ticker = Ticker.objects.create(symbol='T{0}'.format(i))
+            Quote.objects.create(ticker=ticker, date=datetime.today(), sac_to_sacma_ratio=0.01 + i * 0.033)
+        response = self.client.get(reverse('get_recommendations'))
+        buy_ratios = [hit['ratio'] for hit in response.data['buy_hits']]
+        sell_ratios = [hit['ratio'] for hit in response.data['sell_hits']]
+        self.assertEqual(len(buy_ratios), 25)
+        self.assertEqual(buy_ratios, sorted(buy_ratios))
+        self.assertLess(buy_ratios[-1], 1)
+        self.assertEqual(len(sell_ratios), 25)
+        self.assertEqual(sell_ratios, sorted(sell_ratios, reverse=True))
+
+    def test_edited_quotes_update_recommendations(self):
+        ticker = Ticker.objects.create(symbol='TEST')
+        older = Quote.objects.create(ticker=ticker, date=datetime.today().date() - timedelta(days=1),
+                                     sac_to_sacma_ratio=0.5)
+        latest = Quote.objects.create(ticker=ticker, date=datetime.today().date(), sac_to_sacma_ratio=1.5)
+        self.assertEqual(LatestSignal.objects.get(ticker=ticker).sac_to_sacma_ratio, 1.5)
+
+        latest.delete()
+        self.assertEqual(LatestSignal.objects.get(ticker=ticker).date, older.date)
+        older.delete()
+        self.assertFalse(LatestSignal.objects.filter(ticker=ticker).exists())
+
+
+class BenchmarkSuiteTests(ViewTestCase):
+
+    def test_synthetic_quotes_are_deterministic(self):
+        start, end = datetime(2019, 1, 1), datetime(2019, 3, 1)
+        first = SyntheticQuoteProvider().fetch(['AAA'], start, end)['AAA']
+        second = SyntheticQuoteProvider().fetch(['AAA'], start - timedelta(days=30), end)['AAA'].loc[start:]
+        self.assertTrue(first.equals(second))
+        # the market was closed on Presidents' Day
+        self.assertNotIn(pd.Timestamp('2019-02-18'), first.index)
+
+    def test_pipeline_and_endpoints(self):
+        symbols, pipeline = benchmark_pipeline(tickers=2, years=1)
+        self.assertEqual(pipeline['ticker_seconds']['rounds'], 2)
+        self.assertEqual(Quote.objects.filter(ticker__symbol=symbols[0]).count(), pipeline['rows_written'] // 2)
+        endpoints = benchmark_endpoints(symbols[0], rounds=1)
+        self.assertEqual(endpoints['recommendations']['warm']['rounds'], 1)
+
+    def test_web_startup_does_not_load_pandas(self):
+        seconds, peak_kib, heavy_modules = measure_startup(STARTUP_TARGETS['uwsgi app'])
+        self.assertEqual(heavy_modules, [])
+        self.assertGreater(peak_kib, 0)
+
+    def test_startup_regressions(self):
+        def report(seconds, rss):
+            return {'targets': {'uwsgi app': {'seconds': {'median': seconds}, 'max_rss_kib': rss}}}
+        self.assertEqual(startup_regressions(report(1.0, 1000), report(1.1, 1100), 0.2), [])
+        self.assertEqual(len(startup_regressions(report(1.0, 1000), report(1.5, 1300), 0.2)), 2)
@@ -0,0 +1,115 @@
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+# the range every lookup is answered from, built once per process
+FIRST_DAY = date(1970, 1, 1)
+LAST_DAY = date(2060, 12, 31)
+
+# unscheduled NYSE closures
+SPECIAL_CLOSURES = [
+    date(1985, 9, 27),  # Hurricane Gloria
+    date(1994, 4, 27),  # Richard Nixon
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11),  # Ronald Reagan
+    date(2007, 1, 2),  # Gerald Ford
+    date(2012, 10, 29), date(2012, 10, 30),  # Hurricane Sandy
+    date(2018, 12, 5),  # George H. W. Bush
+    date(2025, 1, 9),  # Jimmy Carter
+]
+
+
+def exchange_holidays(first_day, last_day):
+    # pandas is only imported once a process first builds the calendar, not by everything importing this module
+    from pandas.tseries.holiday import AbstractHolidayCalendar, Holiday, nearest_workday, sunday_to_monday, \
+        USMartinLutherKingJr, USPresidentsDay, GoodFriday, USMemorialDay, \
+        USLaborDay, USThanksgivingDay
+
+    # https://stackoverflow.com/a/36525605/2551686
+    class USTradingCalendar(AbstractHolidayCalendar):
+        rules = [
+            # the exchange does not close on Friday when New Year's Day is a Saturday
+            Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+            USMartinLutherKingJr,
+            USPresidentsDay,
+            GoodFriday,
+            USMemorialDay,
+            Holiday('Juneteenth', month=6, day=19, start_date=date(2022, 1, 1), observance=nearest_workday),
+            Holiday('USIndependenceDay', month=7, day=4, observance=nearest_workday),
+            USLaborDay,
+            USThanksgivingDay,
+            Holiday('Christmas', month=12, day=25, observance=nearest_workday)
+        ]
+
+    return USTradingCalendar().holidays(first_day, last_day).values.astype('datetime64[D]')
+
+
+class TradingDays(object):
+
+    # one entry per calendar day, so every lookup is a list index
+    def __init__(self, first_day=FIRST_DAY, last_day=LAST_DAY):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.first_ordinal = first_day.toordinal()
+
+        days = np.arange(np.datetime64(first_day), np.datetime64(last_day) + 1)
+        # 1970-01-01 was a Thursday; 0 is Monday as in date.weekday()
+        weekdays = (days.astype(np.int64) + 3) % 7
+        holidays = exchange_holidays(first_day, last_day)
+        closures = np.array(SPECIAL_CLOSURES, dtype='datetime64[D]')
+        is_open = (weekdays < 5) & ~np.isin(days, holidays) & ~np.isin(days, closures)
+
+        self.is_open = is_open.tolist()
+        # trading days on or before each calendar day
+        self.opened = np.cumsum(is_open).tolist()
+        self.trading_days = days[is_open].astype(object).tolist()
+
+    def offset(self, day):
+        offset = day.toordinal() - self.first_ordinal
+        if offset < 0 or offset >= len(self.is_open):
+            raise ValueError('{0} is outside the trading calendar ({1} to {2})'.format(
+                day, self.first_day, self.last_day))
+        return offset
+
+    def is_trading_day(self, day):
+        return self.is_open[self.offset(day)]
+
+    def latest_trading_day(self, day):
+        # day itself when the market opens that day, otherwise the trading day before it
+        opened = self.opened[self.offset(day)]
+        return self.trading_days[opened - 1] if opened else None
+
+    def previous_trading_day(self, day):
+        offset = self.offset(day)
+        opened = self.opened[offset] - self.is_open[offset]
+        return self.trading_days[opened - 1] if opened else None
+
+    def count_between(self, start, end):
+        # trading days after start, up to and including end
+        return self.opened[self.offset(end)] - self.opened[self.offset(start)]
+
+    def between(self, start, end):
+        return self.trading_days[self.opened[self.offset(start)]:self.opened[self.offset(end)]]
+
+
+@lru_cache(maxsize=None)
+def trading_days():
+    return TradingDays()
+
+
+def is_trading_day(day):
+    return trading_days().is_trading_day(day)
+
+
+def latest_trading_day(day):
+    return trading_days().latest_trading_day(day)
+
+
+def previous_trading_day(day):
+    return trading_days().previous_trading_day(day)
+
+
+def missing_trading_days(start, end, dates):
+    # the trading days after start, up to and including end, that are not in dates
+    return [day for day in trading_days().between(start, end) if day not in dates]
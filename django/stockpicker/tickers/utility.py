@@ -1,119 +1,389 @@
+import abc
+import math
+import os
+
 from django.utils.timezone import datetime, timedelta
 
 from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+import requests
+
+from tickers.models import Ticker, Quote, LatestSignal, WindowSignal
+from tickers.signals import compute_signals, signal_windows
+from tickers.index_cache import index_adj_close_for, invalidate_index_series
+from tickers.response_cache import invalidate_ticker_responses
+from tickers.metrics import TickerTimings, record_ticker_update
+from tickers.trading_days import latest_trading_day, missing_trading_days
+from tickers.series import refresh_quote_series
+
+# Quote field -> finance API column
+BASE_QUOTE_FIELDS = {
+    'high': 'High',
+    'low': 'Low',
+    'open': 'Open',
+    'close': 'Close',
+    'volume': 'Volume',
+    'adj_close': 'Adj Close',
+}
+
+DERIVED_QUOTE_FIELDS = [
+    'index_adj_close',
+    'scaled_adj_close',
+    'sac_moving_average',
+    'quotes_in_moving_average',
+    'sac_to_sacma_ratio',
+]
+
+# relative change in a stored adj_close that we treat as a dividend/split re-adjustment
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+def merge_quotes(ticker, new_quotes, since=None):
+    # apply downloaded rows to the ticker's stored quotes (from `since` on) without saving,
+    # returning every quote (stored and new) ordered by date
+    stored_quotes = ticker.quote_set.all()
+    if since is not None:
+        stored_quotes = stored_quotes.filter(date__gte=since)
+    quotes = {q.date: q for q in stored_quotes}
+    for quote_date, quote_data in new_quotes.items():
+        quote = quotes.get(quote_date)
+        if quote is None:
+            quote = quotes[quote_date] = Quote(ticker=ticker, date=quote_date)
+        for field, column in BASE_QUOTE_FIELDS.items():
+            setattr(quote, field, quote_data[column])
+    return [quotes[quote_date] for quote_date in sorted(quotes)]
+
+
+def write_quotes(quotes, fields=None):
+    # batched INSERTs for new quotes and batched UPDATEs for stored ones
+    if fields is None:
+        fields = list(BASE_QUOTE_FIELDS) + DERIVED_QUOTE_FIELDS
+    with transaction.atomic():
+        Quote.objects.bulk_create([q for q in quotes if q.pk is None],
+                                  batch_size=settings.QUOTE_WRITE_BATCH_SIZE)
+        Quote.objects.bulk_update([q for q in quotes if q.pk is not None], fields,
+                                  batch_size=settings.QUOTE_WRITE_BATCH_SIZE)
+
+
+class QuoteProvider(abc.ABC):
+
+    # returns {symbol: DataFrame indexed by date, with the BASE_QUOTE_FIELDS columns};
+    # symbols without data are left out
+    @abc.abstractmethod
+    def fetch(self, symbols, start, end):
+        pass
+
+
+class YahooQuoteProvider(QuoteProvider):
+
+    # get_quote_provider() keeps one provider per process, so a reused worker keeps the
+    # session's pooled HTTPS connections to the API between tasks
+    def __init__(self):
+        self.session = requests.Session()
+
+    def fetch(self, symbols, start, end):
+        # imported on the first download, so web processes never load pandas_datareader
+        from pandas_datareader import data as web
+        from pandas_datareader._utils import RemoteDataError
+
+        symbols = list(symbols)
+        try:
+            data = web.get_data_yahoo(symbols if len(symbols) > 1 else symbols[0], start, end, session=self.session)
+        except RemoteDataError:
+            print('Error getting finance data for {0}'.format(', '.join(symbols)))
+            return {}
+        if len(symbols) == 1:
+            return {symbols[0]: data}
+        return split_symbol_frames(data)
+
+
+def split_symbol_frames(data):
+    # multi-symbol downloads have (attribute, symbol) columns; xs() and the row filter both copy,
+    # so each symbol's frame is its own and update_symbols() can let go of it once the symbol is done
+    frames = {}
+    for symbol in data.columns.get_level_values(1).unique():
+        frame = data.xs(symbol, axis=1, level=1)
+        # dates another symbol traded on but this one did not (e.g. before a listing)
+        frame = frame[frame['Adj Close'].notnull()]
+        if len(frame):
+            frames[symbol] = frame
+    return frames
+
+
+def read_quote_files(path):
+    # a directory of <SYMBOL>.csv / <SYMBOL>.parquet files, or one combined file with a Symbol column
+    if os.path.isdir(path):
+        frames = {}
+        for file_name in sorted(os.listdir(path)):
+            symbol, extension = os.path.splitext(file_name)
+            if extension in ('.csv', '.parquet'):
+                frames[symbol.upper()] = read_quote_file(os.path.join(path, file_name))
+        return frames
+    combined = read_quote_file(path)
+    return {symbol: frame.drop(columns='Symbol') for symbol, frame in combined.groupby('Symbol')}
+
+
+def read_quote_file(path):
+    import pandas as pd
+
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path)
+        if 'Date' in frame.columns:
+            frame = frame.set_index('Date')
+        frame.index = pd.to_datetime(frame.index)
+    else:
+        frame = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+    return frame.sort_index()
+
+
+class LocalFileQuoteProvider(QuoteProvider):
+
+    def __init__(self, path=None):
+        self.path = path or settings.QUOTE_FILES_PATH
+        self.frames = None
+
+    def fetch(self, symbols, start, end):
+        if self.frames is None:
+            self.frames = read_quote_files(self.path)
+        return {symbol: self.frames[symbol].loc[start:end] for symbol in symbols if symbol in self.frames}
+
+
+_quote_providers = {}
+
+
+def get_quote_provider():
+    # one provider per process, so providers can keep sessions and loaded files between tasks
+    provider = _quote_providers.get(settings.QUOTE_PROVIDER)
+    if provider is None:
+        provider = _quote_providers[settings.QUOTE_PROVIDER] = import_string(settings.QUOTE_PROVIDER)()
+    return provider
+
+
+def reset_quote_providers():
+    # forked children must not share the parent's provider, whose session holds pooled sockets
+    _quote_providers.clear()
+
+
+def frame_to_quotes(frame):
+    return {timestamp.date(): row for timestamp, row in frame.to_dict('index').items()}
+
+
+def prefetch_quotes(symbols, force=False):
+    # download a whole batch in one provider request, from the earliest date any of them needs;
+    # forced updates need the full window
+    today = datetime.now()
+    start = today + timedelta(weeks=-settings.WEEKS_TO_DOWNLOAD)
+    if settings.INCREMENTAL_UPDATES and not force:
+        plans = [plan_incremental_update(ticker) for ticker in Ticker.objects.filter(symbol__in=symbols)]
+        if len(plans) == len(symbols) and None not in plans:
+            start = datetime.combine(min(plan[0] for plan in plans), datetime.min.time())
+    return start, get_quote_provider().fetch(symbols, start, today)
+
 
-from pandas_datareader import data as web
-from pandas_datareader._utils import RemoteDataError
+def download_quotes(ticker_symbol, start, end, prefetched=None):
+    frame = None
+    if prefetched is not None:
+        prefetch_start, frames = prefetched
+        if prefetch_start <= start and ticker_symbol in frames:
+            frame = frames[ticker_symbol].loc[start:]
+    if frame is None:
+        frame = get_quote_provider().fetch([ticker_symbol], start, end).get(ticker_symbol)
+    if frame is None:
+        print('Error getting finance data for {0}'.format(ticker_symbol))
+        return None
+    return frame_to_quotes(frame)
 
-from tickers.models import Ticker, Quote
 
-#####
-# https://stackoverflow.com/a/36525605/2551686
-import datetime as dt
+def plan_incremental_update(ticker):
+    # (check_date, recompute_from): the last complete stored day, downloaded again to detect
+    # gaps and re-adjustments, and the latest stored day, which may have been a partial day
+    # and is the first row whose moving-average window can change
+    latest_dates = list(ticker.quote_set.order_by('-date').values_list('date', flat=True)[:2])
+    if len(latest_dates) < 2:
+        return None
+    return latest_dates[1], latest_dates[0]
 
-from pandas.tseries.holiday import AbstractHolidayCalendar, Holiday, nearest_workday, \
-    USMartinLutherKingJr, USPresidentsDay, GoodFriday, USMemorialDay, \
-    USLaborDay, USThanksgivingDay
 
+def adj_close_changed(stored, downloaded):
+    return not math.isclose(stored, downloaded, rel_tol=ADJUSTMENT_TOLERANCE)
 
-class USTradingCalendar(AbstractHolidayCalendar):
-    rules = [
-        Holiday('NewYearsDay', month=1, day=1, observance=nearest_workday),
-        USMartinLutherKingJr,
-        USPresidentsDay,
-        GoodFriday,
-        USMemorialDay,
-        Holiday('USIndependenceDay', month=7, day=4, observance=nearest_workday),
-        USLaborDay,
-        USThanksgivingDay,
-        Holiday('Christmas', month=12, day=25, observance=nearest_workday)
-    ]
 
+def history_is_continuous(ticker, check_date, new_quotes):
+    if check_date not in new_quotes:
+        print('{0}: no quote for {1} in the download, rebuilding'.format(ticker.symbol, check_date))
+        return False
+    missing = missing_trading_days(check_date, max(new_quotes), new_quotes)
+    if missing:
+        print('{0}: the download has no quote for {1}, rebuilding'.format(ticker.symbol, missing[0]))
+        return False
+    stored_adj_close = ticker.quote_set.filter(date=check_date).values_list('adj_close', flat=True).first()
+    if adj_close_changed(stored_adj_close, new_quotes[check_date]['Adj Close']):
+        print('{0}: adj_close for {1} was re-adjusted, rebuilding'.format(ticker.symbol, check_date))
+        return False
+    return True
 
-def get_trading_close_holidays(year):
-    inst = USTradingCalendar()
 
-    return inst.holidays(dt.datetime(year - 1, 12, 31), dt.datetime(year, 12, 31))
-#####
+def index_is_unchanged(ticker, check_date):
+    # an index re-adjustment changes every stored scaled_adj_close, but not this ticker's own data
+    if ticker.symbol == settings.INDEX_TICKER:
+        return True
+    stored_index_adj_close = ticker.quote_set.filter(date=check_date).values_list('index_adj_close', flat=True).first()
+    index_adj_close = Quote.objects.filter(ticker__symbol=settings.INDEX_TICKER,
+                                           date=check_date).values_list('adj_close', flat=True).first()
+    return index_adj_close is not None and not adj_close_changed(stored_index_adj_close, index_adj_close)
 
 
-def update_ticker_data(symbol, force=False):
+def update_quotes(ticker_symbol, force_update=False, prefetched=None, progress=None, lock=None):
 
-    def update_quotes(ticker_symbol, force_update=False):
+    timings = TickerTimings(ticker_symbol)
 
+    with connection.execute_wrapper(timings.count_query):
+        updated = refresh_quotes(ticker_symbol, force_update, prefetched, progress, timings, lock)
+
+    if not updated:
+        return None
+
+    record_ticker_update(timings)
+    print(timings.describe())
+    return timings
+
+
+def refresh_quotes(ticker_symbol, force_update, prefetched, progress, timings, lock):
+
+    with timings.stage('db_read'):
         ticker, _ = Ticker.objects.get_or_create(symbol=ticker_symbol)
+        latest_quote_date = ticker.latest_quote_date()
+
+    last_business_day = latest_trading_day(datetime.today().date())
+
+    # don't waste work
+    if not (force_update or latest_quote_date is None or latest_quote_date < last_business_day):
+        return False
+
+    print('latest_quote_date: {0}, last_business_day: {1}'.format(latest_quote_date, last_business_day))
+
+    print('Updating: {0}'.format(ticker_symbol))
+
+    # progress(stage) lets callers such as the add-ticker job report where the update is
+    if progress is None:
+        progress = report_nothing
+
+    progress('downloading')
+
+    today = datetime.now()
+
+    new_quotes = None
+    recompute_from = None
+
+    plan = None
+    if settings.INCREMENTAL_UPDATES and not force_update:
+        with timings.stage('db_read'):
+            plan = plan_incremental_update(ticker)
+
+    if plan is not None:
+        check_date, recompute_from = plan
+        start = datetime.combine(check_date, datetime.min.time())
+        with timings.stage('download'):
+            new_quotes = download_quotes(ticker_symbol, start, today, prefetched)
+        if new_quotes is None:
+            return False
+        with timings.stage('db_read'):
+            if not history_is_continuous(ticker, check_date, new_quotes):
+                new_quotes = None
+            elif not index_is_unchanged(ticker, check_date):
+                print('{0}: index was re-adjusted, recomputing all quotes'.format(ticker_symbol))
+                recompute_from = None
+
+    if new_quotes is None:
+        start = today + timedelta(weeks=-settings.WEEKS_TO_DOWNLOAD)
+        with timings.stage('download'):
+            new_quotes = download_quotes(ticker_symbol, start, today, prefetched)
+        if new_quotes is None:
+            return False
+        recompute_from = None
+
+    timings.count('rows_fetched', len(new_quotes))
+
+    windows = signal_windows()
+
+    # only quotes inside the longest moving-average window of a changed row are needed
+    since = None
+    if recompute_from is not None:
+        since = recompute_from + timedelta(weeks=-max([settings.MOVING_AVERAGE_WEEKS] + windows))
+
+    with transaction.atomic():
+        # serialize concurrent writers of the same ticker
+        Ticker.objects.select_for_update().filter(pk=ticker.pk).first()
+
+        # raises LockLost, before anything is written, if another worker has taken the ticker over
+        if lock is not None:
+            lock.check(ticker)
+
+        progress('computing')
+
+        with timings.stage('db_read'):
+            ticker_quotes_list = merge_quotes(ticker, new_quotes, since=since)
+
+            dates = [q.date for q in ticker_quotes_list]
+
+            if ticker_symbol == settings.INDEX_TICKER:
+                # the index is scaled by itself, including the rows not written yet
+                index_adj_close = [q.adj_close for q in ticker_quotes_list]
+            else:
+                index_adj_close = index_adj_close_for(dates)
+
+        with timings.stage('compute'):
+            # scaled_adj_close and the moving average for every day, in one pass
+            signals = compute_signals(dates=dates,
+                                      adj_close=[q.adj_close for q in ticker_quotes_list],
+                                      index_adj_close=index_adj_close,
+                                      windows=windows)
+            window_signals = signals.pop('windows')
+
+            for field, values in signals.items():
+                for quote, value in zip(ticker_quotes_list, values.tolist()):
+                    setattr(quote, field, value)
+
+            if recompute_from is not None:
+                ticker_quotes_list = [q for q in ticker_quotes_list if q.date >= recompute_from]
+
+        progress('writing')
+
+        with timings.stage('write'):
+            write_quotes(ticker_quotes_list)
+            WindowSignal.replace(ticker, dates, window_signals, since=recompute_from)
+
+            if ticker_quotes_list:
+                LatestSignal.refresh(ticker, ticker_quotes_list[-1])
+                ticker.set_latest_quote_date(ticker_quotes_list[-1].date)
+
+            if settings.QUOTE_SERIES_STORAGE == 'packed':
+                refresh_quote_series(ticker)
+
+        timings.count('rows_written', len(ticker_quotes_list))
+
+    if ticker_symbol == settings.INDEX_TICKER:
+        invalidate_index_series()
+
+    invalidate_ticker_responses(ticker_symbol)
+
+    print('Found %s quotes for %s from %s to %s, wrote %s' % (len(new_quotes), ticker_symbol,
+                                                              start.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'),
+                                                              len(ticker_quotes_list)))
+
+    return True
+
+
+def report_nothing(stage):
+    pass
+
 
-        last_business_day = datetime.today().date()
-
-        if last_business_day.strftime('%Y-%m-%d') in get_trading_close_holidays(last_business_day.year):
-            last_business_day = last_business_day + timedelta(days=-1)
-
-        # weekday() gives 0 for Monday through 6 for Sunday
-        while last_business_day.weekday() > 4:
-            last_business_day = last_business_day + timedelta(days=-1)
-
-        # don't waste work
-        if force_update or ticker.latest_quote_date() is None or ticker.latest_quote_date() < last_business_day:
-
-            print('latest_quote_date: {0}, last_business_day: {1}'.format(ticker.latest_quote_date(),
-                                                                          last_business_day))
-
-            print('Updating: {0}'.format(ticker_symbol))
-
-            today = datetime.now()
-            start = today + timedelta(weeks=-settings.WEEKS_TO_DOWNLOAD)
-
-            new_quotes = dict()
-            yahoo_data = web.get_data_yahoo(ticker_symbol, start, today)
-            try:
-                for row in yahoo_data.iterrows():
-                    quote_date = row[0].strftime('%Y-%m-%d')
-                    quote_data = row[1].to_dict()
-                    new_quotes[quote_date] = quote_data
-            except RemoteDataError:
-                print('Error getting finance data for {0}'.format(ticker_symbol))
-                return
-
-            # base data from finance API:
-            for quote_date, quote_data in new_quotes.items():
-                try:
-                    quote, _ = Quote.objects.get_or_create(ticker=ticker, date=quote_date)
-                except Quote.MultipleObjectsReturned:
-                    quote = Quote.objects.filter(ticker=ticker, date=quote_date).first()
-                quote.high = quote_data['High']
-                quote.low = quote_data['Low']
-                quote.open = quote_data['Open']
-                quote.close = quote_data['Close']
-                quote.volume = quote_data['Volume']
-                quote.adj_close = quote_data['Adj Close']
-                quote.save()
-
-            index_quotes_dict = {q.date: q for q in Ticker.objects.get(symbol=settings.INDEX_TICKER).quote_set.order_by('date')}
-
-            ticker_quotes_list = [q for q in ticker.quote_set.order_by('date')]
-
-            # set scaled_adj_close on all quotes first
-            for quote in ticker_quotes_list:
-                quote.index_adj_close = index_quotes_dict[quote.date].adj_close
-                quote.scaled_adj_close = quote.adj_close / quote.index_adj_close
-
-            # calculate moving average for each day
-            for quote in ticker_quotes_list:
-                moving_average_start = quote.date + timedelta(weeks=-settings.MOVING_AVERAGE_WEEKS)
-                moving_average_quote_set = [q for q in ticker_quotes_list if moving_average_start <= q.date <= quote.date]
-                moving_average_quote_values = [v.scaled_adj_close for v in moving_average_quote_set]
-                quote.quotes_in_moving_average = len(moving_average_quote_values)
-                quote.sac_moving_average = sum(moving_average_quote_values) / quote.quotes_in_moving_average
-                quote.sac_to_sacma_ratio = quote.scaled_adj_close / quote.sac_moving_average
-
-            # save changes
-            for quote in ticker_quotes_list:
-                quote.save()
-
-            print('Found %s quotes for %s from %s to %s' % (len(new_quotes), ticker_symbol,
-                                                            start.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')))
+def update_ticker_data(symbol, force=False, update_index=True, prefetched=None, progress=None, lock=None):
 
     # first update the index data, since we need it for calculations
-    update_quotes(ticker_symbol=settings.INDEX_TICKER)
+    if update_index:
+        update_quotes(ticker_symbol=settings.INDEX_TICKER)
 
-    update_quotes(ticker_symbol=symbol, force_update=force)
+    return update_quotes(ticker_symbol=symbol, force_update=force, prefetched=prefetched, progress=progress, lock=lock)
@@ -1,41 +1,140 @@
+import uuid
+
+import numpy as np
+
 from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.timezone import datetime
+from django.views import View
+
+from celery.result import AsyncResult
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.status import HTTP_412_PRECONDITION_FAILED, HTTP_200_OK
+from rest_framework.status import HTTP_412_PRECONDITION_FAILED, HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import AllowAny
 
-from tickers.models import Ticker, Quote
-from tickers.utility import update_ticker_data
+from stockpicker.celery import app
+from tickers.models import Ticker, Quote, LatestSignal, WindowSignal
+from tickers.tasks import add_ticker, add_ticker_job_key, add_ticker_status_key, ADD_TICKER_JOB_SECONDS, \
+    ADD_TICKER_STATUS_SECONDS
+from tickers.series import ticker_series, rows_payload, columns_payload, packed_payload
+from tickers.downsampling import downsample
+from tickers.response_cache import cached_response, request_symbol, cache_stats
+from tickers.metrics import prometheus_metrics
+from tickers.export import export_rows, export_chunks, export_file_name, EXPORT_CONTENT_TYPES
+from tickers.cross_section import get_ratio_matrix
+
+
+# `layout` query parameter -> payload builder; rows (one dict per quote) is the default.
+# `start`/`end` (YYYY-MM-DD) limit the date range and `points` downsamples to at most that many quotes.
+RESULT_LAYOUTS = {
+    'rows': rows_payload,
+    'columns': columns_payload,
+    'packed': packed_payload,
+}
 
 
 class SearchTickerDataView(APIView):
     authentication_classes = (SessionAuthentication,)
     permission_classes = (AllowAny,)
 
+    @cached_response(request_symbol)
+    def get(self, request, format=None):
+        return self.ticker_data(request, request.query_params['ticker'])
+
+    @cached_response(request_symbol)
     def post(self, request, format=None):
+        return self.ticker_data(request, request.data['ticker'])
+
+    def ticker_data(self, request, ticker_symbol):
+        layout = request.query_params.get('layout', 'rows')
+        if layout not in RESULT_LAYOUTS:
+            return Response({'success': False, 'error': 'Unknown layout "{0}"'.format(layout)},
+                            status=HTTP_412_PRECONDITION_FAILED)
+
+        try:
+            start = parse_date_parameter(request, 'start')
+            end = parse_date_parameter(request, 'end')
+            points = parse_points_parameter(request)
+            weeks = parse_window_parameter(request)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=HTTP_412_PRECONDITION_FAILED)
+
+        downsample_method = request.query_params.get('downsample', 'lttb')
+        if downsample_method not in ('lttb', 'minmax'):
+            return Response({'success': False, 'error': 'Unknown downsample "{0}"'.format(downsample_method)},
+                            status=HTTP_412_PRECONDITION_FAILED)
 
-        ticker_symbol = request.data['ticker']
         try:
             ticker = Ticker.objects.get(symbol=ticker_symbol)
         except Ticker.DoesNotExist:
             return Response({'success': False, 'error': 'Ticker "{0}" does not exist'.format(ticker_symbol)},
                             status=HTTP_412_PRECONDITION_FAILED)
 
-        return Response({
+        try:
+            series = ticker_series(ticker, start, end, weeks)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=HTTP_412_PRECONDITION_FAILED)
+
+        data = {
             'success': True,
             'ticker': ticker.symbol,
             'index': settings.INDEX_TICKER,
-            'avg_weeks': settings.MOVING_AVERAGE_WEEKS,
-            'results': [quote.serialize() for quote in ticker.quote_set.order_by('date')]
-        }, status=HTTP_200_OK)
+            'avg_weeks': weeks,
+        }
+        if layout != 'rows':
+            data['layout'] = layout
+        if points is not None and points < len(series['date']):
+            data['downsample'] = downsample_method
+            data['total_quotes'] = len(series['date'])
+            series = downsample(series, points, downsample_method)
+        data['results'] = RESULT_LAYOUTS[layout](series, ticker.symbol)
+
+        return Response(data, status=HTTP_200_OK)
+
+
+def parse_date_parameter(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid {0} date "{1}", expected YYYY-MM-DD'.format(name, value))
+
+
+def parse_window_parameter(request):
+    # moving-average weeks, one of SIGNAL_WINDOWS_WEEKS
+    value = request.query_params.get('window')
+    if not value:
+        return settings.MOVING_AVERAGE_WEEKS
+    windows = sorted(set(settings.SIGNAL_WINDOWS_WEEKS) | {settings.MOVING_AVERAGE_WEEKS})
+    if value not in [str(weeks) for weeks in windows]:
+        raise ValueError('window must be one of {0}'.format(', '.join(str(weeks) for weeks in windows)))
+    return int(value)
+
+
+def parse_points_parameter(request):
+    value = request.query_params.get('points')
+    if not value:
+        return None
+    try:
+        points = int(value)
+    except ValueError:
+        points = 0
+    if points < 4:
+        raise ValueError('points must be a whole number of at least 4')
+    return points
 
 
 class TickersLoadedView(APIView):
     authentication_classes = (SessionAuthentication,)
     permission_classes = (AllowAny,)
 
+    @cached_response()
     def get(self, request, format=None):
 
         return Response({'tickers': [t.symbol for t in Ticker.objects.order_by('symbol')]}, status=HTTP_200_OK)
@@ -45,28 +144,62 @@ class GetRecommendationsView(APIView):
     authentication_classes = (SessionAuthentication,)
     permission_classes = (AllowAny,)
 
+    @cached_response()
     def get(self, request, format=None):
 
+        try:
+            weeks = parse_window_parameter(request)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=HTTP_412_PRECONDITION_FAILED)
+
         try:
             index_ticker = Ticker.objects.get(symbol=settings.INDEX_TICKER)
         except Ticker.DoesNotExist:
             return Response({'success': False, 'error': 'Ticker "{0}" does not exist'.format(settings.INDEX_TICKER)},
                             status=HTTP_412_PRECONDITION_FAILED)
 
-        if index_ticker.latest_quote_date() is None:
+        latest_quote_date = index_ticker.latest_quote_date()
+
+        if latest_quote_date is None:
             return Response({'success': False, 'error': 'No Quotes available.'}, status=HTTP_412_PRECONDITION_FAILED)
 
-        sell_hits = Quote.objects.filter(date=index_ticker.latest_quote_date(),
-                                         sac_to_sacma_ratio__gt=1).order_by('-sac_to_sacma_ratio')
-        buy_hits = Quote.objects.filter(date=index_ticker.latest_quote_date(),
-                                        sac_to_sacma_ratio__gt=0,
-                                        sac_to_sacma_ratio__lt=1).order_by('sac_to_sacma_ratio')
-        return Response({
+        if weeks == settings.MOVING_AVERAGE_WEEKS:
+            signals = LatestSignal.objects.filter(date=latest_quote_date).select_related('ticker')
+        else:
+            signals = WindowSignal.objects.filter(weeks=weeks, date=latest_quote_date).select_related('ticker')
+        sell_hits = list(signals.filter(sac_to_sacma_ratio__gt=1).order_by('-sac_to_sacma_ratio')[:25])
+        # the 25 buy hits closest to 1, listed in ascending order
+        buy_hits = list(signals.filter(sac_to_sacma_ratio__gt=0,
+                                       sac_to_sacma_ratio__lt=1).order_by('-sac_to_sacma_ratio')[:25])[::-1]
+
+        if weeks == settings.MOVING_AVERAGE_WEEKS:
+            serialize = LatestSignal.serialize
+        else:
+            serialize = window_serializer(latest_quote_date, sell_hits + buy_hits)
+
+        data = {
             'success': True,
-            'latest_data_date': index_ticker.latest_quote_date().strftime('%Y-%m-%d'),
-            'sell_hits': [quote.serialize() for quote in list(sell_hits)[:25]],
-            'buy_hits': [quote.serialize() for quote in list(buy_hits)[-25:]]
-        }, status=HTTP_200_OK)
+            'latest_data_date': latest_quote_date.strftime('%Y-%m-%d'),
+            'sell_hits': [serialize(signal) for signal in sell_hits],
+            'buy_hits': [serialize(signal) for signal in buy_hits]
+        }
+        if 'window' in request.query_params:
+            data['avg_weeks'] = weeks
+        return Response(data, status=HTTP_200_OK)
+
+
+def window_serializer(date, signals):
+    # WindowSignal rows serialized like quotes, with one query for the quotes they belong to
+    quotes = Quote.objects.filter(date=date, ticker_id__in=[signal.ticker_id for signal in signals])
+    quotes = {quote.ticker_id: quote for quote in quotes.select_related('ticker')}
+
+    def serialize(signal):
+        data = quotes[signal.ticker_id].serialize()
+        data['sac_ma'] = round(signal.sac_moving_average, settings.DECIMAL_DIGITS)
+        data['ratio'] = round(signal.sac_to_sacma_ratio, settings.DECIMAL_DIGITS)
+        return data
+
+    return serialize
 
 
 class AddTickerView(APIView):
@@ -76,6 +209,165 @@ class AddTickerView(APIView):
     def post(self, request, format=None):
 
         ticker_symbol = request.data['ticker']
-        update_ticker_data(ticker_symbol, force=True)
 
-        return Response({'success': True}, status=HTTP_200_OK)
+        # concurrent adds of the same symbol share one job; cache.add returns False if the key already exists
+        job_id = None
+        while job_id is None:
+            job_id = uuid.uuid4().hex
+            if cache.add(add_ticker_job_key(ticker_symbol), job_id, ADD_TICKER_JOB_SECONDS):
+                cache.set(add_ticker_status_key(job_id), ticker_symbol, ADD_TICKER_STATUS_SECONDS)
+                add_ticker.apply_async((ticker_symbol,), task_id=job_id)
+            else:
+                job_id = cache.get(add_ticker_job_key(ticker_symbol))
+
+        return Response({'success': True, 'job_id': job_id}, status=HTTP_202_ACCEPTED)
+
+
+class JobStatusView(APIView):
+    authentication_classes = (SessionAuthentication,)
+    permission_classes = (AllowAny,)
+
+    def get(self, request, job_id, format=None):
+
+        if cache.get(add_ticker_status_key(job_id)) is None:
+            return Response({'success': False, 'job_id': job_id,
+                             'error': 'Unknown or expired job "{0}"'.format(job_id)}, status=HTTP_404_NOT_FOUND)
+
+        result = AsyncResult(job_id, app=app)
+        data = {'success': True, 'job_id': job_id, 'state': result.state, 'ready': result.ready()}
+        if result.state == 'PROGRESS':
+            data.update(result.info)
+        elif result.state == 'SUCCESS':
+            data.update(result.result)
+        elif result.state == 'FAILURE':
+            data.update({'success': False, 'error': repr(result.result)})
+        return Response(data, status=HTTP_200_OK)
+
+
+class ResponseCacheStatsView(APIView):
+    authentication_classes = (SessionAuthentication,)
+    permission_classes = (AllowAny,)
+
+    def get(self, request, format=None):
+
+        return Response(cache_stats(), status=HTTP_200_OK)
+
+
+class CrossSectionView(APIView):
+    authentication_classes = (SessionAuthentication,)
+    permission_classes = (AllowAny,)
+
+    # every ticker's ratio on one date (`date`, default the latest) from the cached ratio matrix:
+    # the `count` highest and lowest, `tickers=AAA,BBB` for chosen ones, `history=1` for daily hit counts
+    @cached_response()
+    def get(self, request, format=None):
+
+        try:
+            day = parse_date_parameter(request, 'date')
+            count = parse_count_parameter(request)
+            weeks = parse_window_parameter(request)
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=HTTP_412_PRECONDITION_FAILED)
+
+        matrix = get_ratio_matrix(weeks)
+        row = matrix.row(day) if matrix is not None else None
+        if row is None:
+            return Response({'success': False, 'error': 'No Quotes available.'}, status=HTTP_412_PRECONDITION_FAILED)
+
+        ratios = matrix.ratios[row]
+        percentiles = matrix.percentiles(row)
+        days_since_cross = matrix.days_since_cross(row)
+
+        def entry(column):
+            if np.isnan(ratios[column]):
+                return {'symbol': matrix.symbols[column], 'ratio': None, 'percentile': None, 'days_since_cross': None}
+            days = int(days_since_cross[column])
+            return {
+                'symbol': matrix.symbols[column],
+                'ratio': round(float(ratios[column]), settings.DECIMAL_DIGITS),
+                'percentile': round(float(percentiles[column]), 1),
+                'days_since_cross': days if days >= 0 else None,
+            }
+
+        highest, lowest = matrix.ranking(row, count)
+        above, below = matrix.hit_counts()
+        data = {
+            'success': True,
+            'date': str(matrix.dates[row]),
+            'avg_weeks': weeks,
+            'tickers': int(np.count_nonzero(~np.isnan(ratios))),
+            'above_one': int(above[row]),
+            'below_one': int(below[row]),
+            'highest': [entry(column) for column in highest.tolist()],
+            'lowest': [entry(column) for column in lowest.tolist()],
+        }
+
+        symbols = [s for s in request.query_params.get('tickers', '').split(',') if s]
+        if symbols:
+            columns = {symbol: column for column, symbol in enumerate(matrix.symbols)}
+            missing = [symbol for symbol in symbols if symbol not in columns]
+            if missing:
+                return Response({'success': False, 'error': 'No ratios for "{0}"'.format(missing[0])},
+                                status=HTTP_412_PRECONDITION_FAILED)
+            data['selected'] = [entry(columns[symbol]) for symbol in symbols]
+
+        if request.query_params.get('history') in ('1', 'true'):
+            data['history'] = {
+                'date': np.datetime_as_string(matrix.dates[:row + 1]).tolist(),
+                'above_one': above[:row + 1].tolist(),
+                'below_one': below[:row + 1].tolist(),
+            }
+
+        return Response(data, status=HTTP_200_OK)
+
+
+def parse_count_parameter(request):
+    value = request.query_params.get('count')
+    if not value:
+        return 25
+    try:
+        count = int(value)
+    except ValueError:
+        count = 0
+    if not 1 <= count <= 500:
+        raise ValueError('count must be a whole number from 1 to 500')
+    return count
+
+
+class QuoteExportView(APIView):
+    authentication_classes = (SessionAuthentication,)
+    permission_classes = (AllowAny,)
+
+    def get(self, request, format=None):
+
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_CONTENT_TYPES:
+            return Response({'success': False, 'error': 'Unknown output "{0}"'.format(output)},
+                            status=HTTP_412_PRECONDITION_FAILED)
+
+        try:
+            start = parse_date_parameter(request, 'start')
+            end = parse_date_parameter(request, 'end')
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=HTTP_412_PRECONDITION_FAILED)
+
+        # every ticker unless ?tickers=AAA,BBB
+        symbols = [s for s in request.query_params.get('tickers', '').split(',') if s]
+        missing = sorted(set(symbols) - set(Ticker.objects.filter(symbol__in=symbols).values_list('symbol', flat=True)))
+        if missing:
+            return Response({'success': False, 'error': 'Ticker "{0}" does not exist'.format(missing[0])},
+                            status=HTTP_412_PRECONDITION_FAILED)
+
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        response = StreamingHttpResponse(export_chunks(export_rows(symbols, start, end), output, compress),
+                                         content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[output])
+        response['Content-Disposition'] = 'attachment; filename="{0}"'.format(export_file_name(output, compress))
+        return response
+
+
+class MetricsView(View):
+
+    # Prometheus text exposition of the update timings recorded by every worker
+    def get(self, request, *args, **kwargs):
+
+        return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4')
@@ -20,8 +20,16 @@ python manage.py collectstatic --noinput
 echo "Create default Tickers..."
 python manage.py load_tickers
 
+if [ -n "$QUOTE_IMPORT_PATH" ]; then
+    echo "Importing quote history from $QUOTE_IMPORT_PATH..."
+    python manage.py import_quotes "$QUOTE_IMPORT_PATH"
+fi
+
+echo "Computing missing signal windows..."
+python manage.py compute_signal_windows --missing
+
 echo "Start Quotes Update Task..."
-echo "from tickers.tasks import chained_ticker_updates; chained_ticker_updates.delay()" | python manage.py shell
+echo "from tickers.tasks import sweep_tickers; sweep_tickers.delay()" | python manage.py shell
 
 echo "Start uWSGI..."
 uwsgi --module stockpicker.wsgi:application --http 0.0.0.0:8001 --static-map /static=/srv/_static